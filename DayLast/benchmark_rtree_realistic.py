@@ -37,11 +37,18 @@ print(f"✓ {len(df):,} 件のレコード")
 print("\nR-treeインデックスを構築中...")
 p = index.Property()
 p.dimension = 2
-idx = index.Index(interleaved=True, properties=p)
+p.leaf_capacity = 100
+p.fill_factor = 0.9
+
+# ストリーム入力でバルクロード（STRパッキング）: iterrows で1件ずつ insert するより高速
+coords = df[['latitude', 'longitude']].to_numpy()
+
+def stream_points():
+    for i, (lat, lon) in enumerate(coords):
+        yield (i, (lat, lon, lat, lon), None)
 
 build_start = time.time()
-for i, row in df.iterrows():
-    idx.insert(i, (row['latitude'], row['longitude']))
+idx = index.Index(stream_points(), interleaved=True, properties=p)
 build_time = time.time() - build_start
 print(f"✓ 構築時間: {build_time:.3f}秒")
 
@@ -63,14 +70,14 @@ for _ in range(num_queries):
         center_lon - size, center_lon + size
     ))
 
-# 線形探索での複数検索
+# 線形探索での複数検索（ループ外で取り出したNumPy配列上でマスク計算し、R-tree同様にインデックスを返す）
+lat_arr = coords[:, 0]
+lon_arr = coords[:, 1]
 linear_times = []
 for min_lat, max_lat, min_lon, max_lon in viewports:
     start = time.time()
-    results = df[
-        (df['latitude'] >= min_lat) & (df['latitude'] <= max_lat) &
-        (df['longitude'] >= min_lon) & (df['longitude'] <= max_lon)
-    ]
+    mask = (lat_arr >= min_lat) & (lat_arr <= max_lat) & (lon_arr >= min_lon) & (lon_arr <= max_lon)
+    results = np.flatnonzero(mask)
     linear_times.append(time.time() - start)
 
 total_linear = sum(linear_times)
@@ -107,17 +114,13 @@ gs = fig.add_gridspec(2, 2, hspace=0.3, wspace=0.3)
 
 # 1. 平均検索時間の比較
 ax1 = fig.add_subplot(gs[0, :])
-methods = ['線形探索\n(pandas)', 'R-tree\n(空間インデックス)']
+methods = ['線形探索\n(NumPy)', 'R-tree\n(空間インデックス)']
 times = [avg_linear * 1000, avg_rtree * 1000]
 colors = ['#e74c3c', '#27ae60']
 bars = ax1.bar(methods, times, color=colors, alpha=0.85, 
                edgecolor='black', linewidth=2.5, width=0.5)
 
-for bar, time_val in zip(bars, times):
-    height = bar.get_height()
-    ax1.text(bar.get_x() + bar.get_width()/2., height + max(times) * 0.02,
-             f'{time_val:.4f}ms', ha='center', va='bottom', 
-             fontsize=14, fontweight='bold')
+ax1.bar_label(bars, fmt='%.4fms', padding=3, fontsize=14, fontweight='bold')
 
 ax1.set_ylabel('平均検索時間 (ミリ秒)', fontsize=13, fontweight='bold')
 ax1.set_title(f'R-tree による空間検索の高速化\n{len(df):,}レコード × {num_queries}回のビューポート検索', 
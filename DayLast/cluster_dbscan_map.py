@@ -14,6 +14,11 @@ import contextily as ctx
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow は任意（未導入なら pandas 標準の C パーサで読み込む）
+    pa = None
+
 # 日本語フォント設定
 def setup_japanese_font():
     if sys.platform == 'win32':
@@ -50,7 +55,13 @@ print("=" * 70)
 
 # データ読み込み
 print("\nデータ読み込み中...")
-df = pd.read_csv('bike_log.csv')
+# 必要な列だけを省メモリな型で読み込む（ステーション名はカテゴリ型にして groupby を高速化）
+df = pd.read_csv(
+    'bike_log.csv',
+    usecols=['timestamp', 'station_name', 'latitude', 'longitude', 'free_bikes'],
+    dtype={'latitude': 'float32', 'longitude': 'float32', 'free_bikes': 'int16', 'station_name': 'category'},
+    engine='pyarrow' if pa is not None else 'c',
+)
 print(f"✓ {len(df):,} 件のレコード")
 
 # 都心/郊外の簡易判定（東京駅からの距離）
@@ -82,13 +93,16 @@ print(f"✓ 郊外(東京駅から{CORE_RADIUS_KM:.0f}km超): {len(df) - core_ma
 if len(low_stock_core) > 10:
     # DBSCAN クラスタリング
     print("\nDBSCAN クラスタリング実行中...")
-    coords = low_stock_core[['latitude', 'longitude']].values
-    clustering = DBSCAN(eps=0.01, min_samples=3).fit(coords)
+    # haversine 距離用に緯度経度をラジアンへ変換
+    coords_rad = np.radians(low_stock_core[['latitude', 'longitude']].to_numpy())
+    # eps=1km（地球半径で割ってラジアン化）, BallTree + haversine, 近傍探索は全コアで並列実行
+    clustering = DBSCAN(eps=1.0 / 6371.0, min_samples=3, metric='haversine',
+                        algorithm='ball_tree', n_jobs=-1).fit(coords_rad)
     labels = clustering.labels_
     n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
     
     print(f"✓ 検出クラスタ数: {n_clusters}")
-    print(f"  eps: 0.01度（約1km）")
+    print(f"  eps: 1km（haversine距離）")
     print(f"  min_samples: 3ステーション")
     
     # Web Mercator座標に変換
@@ -5,7 +5,7 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
 import csv
 
 # ステーション定義
@@ -116,11 +116,10 @@ def generate_donut_data():
         writer = csv.writer(f)
         writer.writerow(['timestamp', 'station_name', 'free_bikes', 'latitude', 'longitude', 'area_type'])
         
-        # 24時間分のデータを10分間隔で生成
-        for minutes in range(0, 24 * 60, 10):  # 10分間隔
-            current_time = start_time + timedelta(minutes=minutes)
-            hour = current_time.hour
-            timestamp_str = current_time.strftime('%Y-%m-%d %H:%M:%S')
+        # 24時間分のデータを10分間隔で生成（タイムスタンプ文字列は一括整形）
+        time_points = pd.date_range(start_time, periods=24 * 6, freq='10min')
+        timestamp_strs = time_points.strftime('%Y-%m-%d %H:%M:%S')
+        for hour, timestamp_str in zip(time_points.hour, timestamp_strs):
             
             # 都心部ステーション
             for station in downtown_stations:
@@ -7,7 +7,9 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 # 東京23区の主要エリア（都心と郊外を広くカバー）
 STATIONS_TOKYO23 = [
@@ -61,6 +63,53 @@ STATIONS_TOKYO23 = [
     {"name": "錦糸町駅", "lat": 35.6969, "lon": 139.8137, "area": "suburb"},
 ]
 
+def simulate_station(station, hours, seed):
+    """1ステーション分の自転車数の時系列をシミュレーション（ステーション間で状態を共有しない）"""
+    rng = np.random.default_rng(seed)
+    free_bikes = np.empty(len(hours), dtype=np.int16)  # 最大35台なので int16 で十分
+    
+    for i, hour in enumerate(hours):
+        
+        # ドーナツ化パターン: 時間帯による都心/郊外の自転車数変動（顕著な差）
+        if station["area"] == "downtown":
+            # 都心部: 早朝・夜は極めて少なく、昼間は極めて多い
+            if 6 <= hour < 9:
+                # 早朝: 都心部はほぼゼロ（住宅街から通勤で持ち出される）
+                base = 1
+                variation = rng.integers(0, 2)
+            elif 9 <= hour < 18:
+                # 日中: 都心部に大量集中（通勤者が持ってくる）
+                base = 28
+                variation = rng.integers(-3, 5)
+            elif 18 <= hour < 21:
+                # 夕方: 都心部から持ち出され始める
+                base = 12
+                variation = rng.integers(-4, 4)
+            else:
+                base = 2
+                variation = rng.integers(0, 2)
+        else:
+            # 郊外部: 早朝・夜は極めて多く、昼間は極めて少ない
+            if 6 <= hour < 9:
+                # 早朝: 郊外部に大量密集（住宅街に夜間停車）
+                base = 30
+                variation = rng.integers(-3, 5)
+            elif 9 <= hour < 18:
+                # 日中: 郊外部はほぼゼロ（通勤で持ち出される）
+                base = 2
+                variation = rng.integers(0, 3)
+            elif 18 <= hour < 21:
+                # 夕方: 郊外部に戻ってくる
+                base = 18
+                variation = rng.integers(-5, 5)
+            else:
+                base = 25
+                variation = rng.integers(-4, 5)
+        
+        free_bikes[i] = max(0, min(35, int(base + variation)))
+    
+    return free_bikes
+
 def generate_donut_pattern_data():
     """ドーナツ化現象を示すデータを生成"""
     print("=" * 70)
@@ -69,64 +118,31 @@ def generate_donut_pattern_data():
     
     # 平日1日分のデータ（6:00-21:50、10分間隔）
     start_time = datetime(2026, 1, 27, 6, 0, 0)
-    time_points = []
-    for i in range(96):  # 6:00-21:50 = 16時間 × 6 (10分間隔)
-        time_points.append(start_time + timedelta(minutes=i*10))
-    
-    records = []
+    time_points = pd.date_range(start_time, periods=96, freq='10min')  # 6:00-21:50 = 16時間 × 6 (10分間隔)
+    hours = (time_points.hour + time_points.minute / 60.0).to_numpy()
+    # タイムスタンプ文字列は列全体をまとめて整形（行ごとの strftime を避ける）
+    timestamps = time_points.strftime('%Y-%m-%d %H:%M:%S').to_numpy()
     
-    for t in time_points:
-        hour = t.hour + t.minute / 60.0
-        
-        # ドーナツ化パターン: 時間帯による都心/郊外の自転車数変動（顕著な差）
-        for station in STATIONS_TOKYO23:
-            if station["area"] == "downtown":
-                # 都心部: 早朝・夜は極めて少なく、昼間は極めて多い
-                if 6 <= hour < 9:
-                    # 早朝: 都心部はほぼゼロ（住宅街から通勤で持ち出される）
-                    base = 1
-                    variation = np.random.randint(0, 2)
-                elif 9 <= hour < 18:
-                    # 日中: 都心部に大量集中（通勤者が持ってくる）
-                    base = 28
-                    variation = np.random.randint(-3, 5)
-                elif 18 <= hour < 21:
-                    # 夕方: 都心部から持ち出され始める
-                    base = 12
-                    variation = np.random.randint(-4, 4)
-                else:
-                    base = 2
-                    variation = np.random.randint(0, 2)
-            else:
-                # 郊外部: 早朝・夜は極めて多く、昼間は極めて少ない
-                if 6 <= hour < 9:
-                    # 早朝: 郊外部に大量密集（住宅街に夜間停車）
-                    base = 30
-                    variation = np.random.randint(-3, 5)
-                elif 9 <= hour < 18:
-                    # 日中: 郊外部はほぼゼロ（通勤で持ち出される）
-                    base = 2
-                    variation = np.random.randint(0, 3)
-                elif 18 <= hour < 21:
-                    # 夕方: 郊外部に戻ってくる
-                    base = 18
-                    variation = np.random.randint(-5, 5)
-                else:
-                    base = 25
-                    variation = np.random.randint(-4, 5)
-            
-            free_bikes = max(0, min(35, base + variation))
-            
-            records.append({
-                "timestamp": t.strftime('%Y-%m-%d %H:%M:%S'),
-                "station_name": station["name"],
-                "free_bikes": free_bikes,
-                "latitude": station["lat"],
-                "longitude": station["lon"],
-                "area_type": station["area"]
-            })
+    # ステーションごとに独立した乱数系列を割り当て、CPUコアに分散してシミュレーション
+    seeds = np.random.SeedSequence().spawn(len(STATIONS_TOKYO23))
+    with ProcessPoolExecutor() as executor:
+        per_station = list(executor.map(
+            simulate_station, STATIONS_TOKYO23, repeat(hours), seeds
+        ))
     
-    df = pd.DataFrame(records)
+    # (時刻 × ステーション) の行列にまとめ、列ごとの配列から直接DataFrameを構築
+    # 行順は時刻順 → ステーション順（従来のCSVと同じ）
+    free_bikes = np.column_stack(per_station)
+    n_times, n_stations = free_bikes.shape
+    df = pd.DataFrame({
+        "timestamp": np.repeat(timestamps, n_stations),
+        "station_name": np.tile([s["name"] for s in STATIONS_TOKYO23], n_times),
+        "free_bikes": free_bikes.ravel(),
+        # float32 でも緯度経度は約1m精度を保てる（可視化用途には十分）
+        "latitude": np.tile(np.array([s["lat"] for s in STATIONS_TOKYO23], dtype=np.float32), n_times),
+        "longitude": np.tile(np.array([s["lon"] for s in STATIONS_TOKYO23], dtype=np.float32), n_times),
+        "area_type": np.tile([s["area"] for s in STATIONS_TOKYO23], n_times),
+    })
     
     # CSV保存
     output_file = "bike_log_donut.csv"
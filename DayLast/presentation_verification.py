@@ -7,15 +7,28 @@
 
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')  # 画像保存のみなので非対話バックエンドを明示
 import matplotlib.pyplot as plt
+from matplotlib import font_manager
 import seaborn as sns
 from sklearn.cluster import DBSCAN
-import time
+import timeit
 import sys
 from rtree import index
 import warnings
 warnings.filterwarnings('ignore')
 
+try:
+    import pyarrow as pa
+except ImportError:  # pyarrow は任意（未導入なら pandas 標準の C パーサで読み込む）
+    pa = None
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba は任意（未導入ならコンパイル版の線形探索は計測しない）
+    njit = None
+
 # 日本語フォント設定
 def setup_japanese_font():
     if sys.platform == 'win32':
@@ -25,9 +38,22 @@ def setup_japanese_font():
     else:
         plt.rcParams['font.family'] = 'DejaVu Sans'
     plt.rcParams['axes.unicode_minus'] = False
+    # フォント解決は最初の1回だけ行い、以降の描画ではキャッシュを使う
+    font_manager.findfont(plt.rcParams['font.family'][0])
+    # 背景の大量散布図の描画を軽くする
+    plt.rcParams['path.simplify'] = True
+    plt.rcParams['agg.path.chunksize'] = 10000
 
 setup_japanese_font()
 
+# すべてのグラフで1つの Figure を使い回す（グラフごとに clf() でリセット）
+fig = plt.figure()
+
+def new_axes(figsize):
+    fig.clf()
+    fig.set_size_inches(figsize)
+    return fig.add_subplot()
+
 print("=" * 60)
 print("プレゼンテーション検証スクリプト")
 print("=" * 60)
@@ -36,7 +62,15 @@ print("=" * 60)
 # 1. データ読み込み
 # ========================================
 print("\n[1/5] データ読み込み中...")
-df = pd.read_csv('bike_log.csv')
+# 必要な列だけを省メモリな型で読み込む（ステーション名はカテゴリ型にして groupby を高速化）
+df = pd.read_csv(
+    'bike_log.csv',
+    usecols=['timestamp', 'station_name', 'latitude', 'longitude', 'free_bikes'],
+    dtype={'latitude': 'float32', 'longitude': 'float32', 'free_bikes': 'int16', 'station_name': 'category'},
+    engine='pyarrow' if pa is not None else 'c',
+)
+# タイムスタンプは読み込み直後に一度だけ変換（書式指定でdateutilへのフォールバックを避け、重複文字列はキャッシュ）
+df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', cache=True)
 print(f"✓ {len(df):,} 件のレコード読み込み完了")
 
 # ========================================
@@ -52,59 +86,85 @@ min_lon, max_lon = 139.73, 139.81
 print("  R-treeインデックスを構築中...")
 p = index.Property()
 p.dimension = 2
-idx = index.Index(interleaved=True, properties=p)
+p.leaf_capacity = 100
+p.fill_factor = 0.9
 
-for i, row in df.iterrows():
-    idx.insert(i, (row['latitude'], row['longitude']))
+# ストリーム入力でバルクロード（STRパッキング）: 1件ずつ insert するより高速で木の偏りも少ない
+coords = df[['latitude', 'longitude']].to_numpy()
+
+def stream_points():
+    for i, (lat, lon) in enumerate(coords):
+        yield (i, (lat, lon, lat, lon), None)
+
+idx = index.Index(stream_points(), interleaved=True, properties=p)
 
 print("  ✓ インデックス構築完了")
 
-# 複数回検索を実施して平均時間を測定（より正確な比較）
+# 複数回検索を実施して1回あたりの時間を測定（より正確な比較）
+# timeit で num_trials 回をまとめて計測し、これを num_repeats 回繰り返した最小値を採用（初回効果・外乱を除外）
 num_trials = 100
-print(f"  {num_trials}回の検索を実施中...")
-
-# 線形探索時間測定（100回平均）
-linear_times = []
-for _ in range(num_trials):
-    start = time.time()
-    linear_results = df[
-        (df['latitude'] >= min_lat) & (df['latitude'] <= max_lat) &
-        (df['longitude'] >= min_lon) & (df['longitude'] <= max_lon)
-    ]
-    linear_times.append(time.time() - start)
-linear_time = np.mean(linear_times)
-
-# R-tree検索時間測定（100回平均、構築時間除外）
-rtree_times = []
+num_repeats = 5
+print(f"  {num_trials}回 × {num_repeats}セットの検索を実施中...")
+
+# 線形探索
+# DataFrame を再構築せず、NumPy 配列上のマスクから該当インデックスだけを取り出す（R-tree と同じ出力形式）
+lat_arr = coords[:, 0]
+lon_arr = coords[:, 1]
+
+def linear_search():
+    mask = ((lat_arr >= min_lat) & (lat_arr <= max_lat) &
+            (lon_arr >= min_lon) & (lon_arr <= max_lon))
+    return np.flatnonzero(mask)
+
+# R-tree検索（構築時間除外）
 rtree_bbox = (min_lat, min_lon, max_lat, max_lon)
-for _ in range(num_trials):
-    start = time.time()
-    rtree_results = list(idx.intersection(rtree_bbox))
-    rtree_times.append(time.time() - start)
-rtree_time = np.mean(rtree_times)
+
+def rtree_search():
+    return list(idx.intersection(rtree_bbox))
+
+linear_results = linear_search()
+rtree_results = rtree_search()
+linear_time = min(timeit.Timer(linear_search).repeat(repeat=num_repeats, number=num_trials)) / num_trials
+rtree_time = min(timeit.Timer(rtree_search).repeat(repeat=num_repeats, number=num_trials)) / num_trials
+
+# 参考: Numba でコンパイルした並列線形探索（件数のみ返す）。NumPy 版より定数倍の小さい「素の全件走査」の目安
+if njit is not None:
+    @njit(parallel=True)
+    def bbox_count(lat, lon, mn_lat, mx_lat, mn_lon, mx_lon):
+        count = 0
+        for i in prange(lat.size):
+            if mn_lat <= lat[i] <= mx_lat and mn_lon <= lon[i] <= mx_lon:
+                count += 1
+        return count
+
+    lat_c = np.ascontiguousarray(lat_arr)
+    lon_c = np.ascontiguousarray(lon_arr)
+    numba_count = bbox_count(lat_c, lon_c, min_lat, max_lat, min_lon, max_lon)  # 初回呼び出しでJITコンパイル
+    numba_time = min(timeit.Timer(
+        lambda: bbox_count(lat_c, lon_c, min_lat, max_lat, min_lon, max_lon)
+    ).repeat(repeat=num_repeats, number=num_trials)) / num_trials
 
 speedup = linear_time / rtree_time
 
-print(f"✓ 線形探索: {linear_time*1000:.4f}ms (平均、結果: {len(linear_results):,} 件)")
-print(f"✓ R-tree検索: {rtree_time*1000:.4f}ms (平均、結果: {len(rtree_results):,} 件)")
+print(f"✓ 線形探索: {linear_time*1000:.4f}ms (1回あたり、結果: {len(linear_results):,} 件)")
+print(f"✓ R-tree検索: {rtree_time*1000:.4f}ms (1回あたり、結果: {len(rtree_results):,} 件)")
+if njit is not None:
+    print(f"✓ 線形探索(Numba並列): {numba_time*1000:.4f}ms (1回あたり、結果: {numba_count:,} 件)")
 print(f"✓ 高速化率: {speedup:.1f}倍")
 
 # ベンチマーク画像生成（改善版レイアウト）
-fig, ax = plt.subplots(figsize=(12, 7))
+ax = new_axes((12, 7))
 methods = ['線形探索', 'R-tree']
 times = [linear_time * 1000, rtree_time * 1000]
 colors = ['#e74c3c', '#27ae60']  # より鮮やかな色
 bars = ax.bar(methods, times, color=colors, alpha=0.85, edgecolor='black', linewidth=2.5, width=0.6)
 
 # バーの上に値を表示
-for bar, time_val in zip(bars, times):
-    height = bar.get_height()
-    ax.text(bar.get_x() + bar.get_width()/2., height + max(times) * 0.02,
-            f'{time_val:.4f}ms', ha='center', va='bottom', 
-            fontsize=13, fontweight='bold', color='black')
+ax.bar_label(bars, fmt='%.4fms', padding=3, fontsize=13, fontweight='bold', color='black')
 
 ax.set_ylabel('検索時間 (ミリ秒)', fontsize=13, fontweight='bold')
-ax.set_title('R-tree による空間検索の高速化\n43,130レコード × ビューポート検索 (100回平均)', 
+ax.set_title(f'R-tree による空間検索の高速化\n43,130レコード × ビューポート検索 '
+             f'(1回あたり: {num_trials}回×{num_repeats}セットの最小値)', 
             fontsize=15, fontweight='bold', pad=20)
 ax.set_ylim(0, max(times) * 1.25)
 ax.grid(axis='y', alpha=0.3, linestyle='--', linewidth=1.2)
@@ -124,7 +184,7 @@ ax.text(0.98, 0.95, speedup_text, transform=ax.transAxes,
         fontweight='bold', color='white', zorder=10)
 
 # 測定条件を追加
-condition_text = f'測定条件:\n・検索回数: {num_trials}回\n・結果件数: {len(linear_results):,}件'
+condition_text = f'測定条件:\n・検索回数: {num_trials}回 × {num_repeats}セット（最小値）\n・結果件数: {len(linear_results):,}件'
 ax.text(0.02, 0.95, condition_text, transform=ax.transAxes,
         fontsize=10, verticalalignment='top',
         bbox=dict(boxstyle='round', facecolor='white', alpha=0.8, edgecolor='gray'),
@@ -132,7 +192,6 @@ ax.text(0.02, 0.95, condition_text, transform=ax.transAxes,
 
 plt.tight_layout()
 plt.savefig('benchmark_result.png', dpi=200, bbox_inches='tight', facecolor='white')
-plt.close()
 print("✓ benchmark_result.png を生成しました")
 
 # ========================================
@@ -145,30 +204,34 @@ low_stock = df[df['free_bikes'] <= 3].copy()
 print(f"✓ 在庫3台以下のレコード: {len(low_stock):,} 件")
 
 if len(low_stock) > 10:
-    # 緯度経度を度からメートルに変換（簡易版）
-    coords = low_stock[['latitude', 'longitude']].values
+    # 緯度経度は配列として一度だけ取り出し、クラスタリングと描画で共用
+    lat_ls = low_stock['latitude'].to_numpy()
+    lon_ls = low_stock['longitude'].to_numpy()
+    # haversine 距離用に緯度経度をラジアンへ変換
+    coords_rad = np.radians(np.column_stack([lat_ls, lon_ls]))
     
-    # DBSCAN: eps=0.01度（約1km）, min_samples=3
-    clustering = DBSCAN(eps=0.01, min_samples=3).fit(coords)
+    # DBSCAN: eps=1km（地球半径で割ってラジアン化）, min_samples=3, BallTree + haversine
+    clustering = DBSCAN(eps=1000 / 6371000, min_samples=3,
+                        algorithm='ball_tree', metric='haversine').fit(coords_rad)
     labels = clustering.labels_
     n_clusters = len(set(labels)) - (1 if -1 in labels else 0)
     
     print(f"✓ 検出クラスタ数: {n_clusters}")
     
     # 可視化
-    fig, ax = plt.subplots(figsize=(12, 10))
+    ax = new_axes((12, 10))
     
-    # 背景: すべてのステーション
-    ax.scatter(df['longitude'], df['latitude'], c='lightblue', s=30, alpha=0.3, label='全ステーション')
+    # 背景: すべてのステーション（点数が多いのでラスタ化して1枚の画像として描画、軸や文字はベクタのまま）
+    ax.scatter(lon_arr, lat_arr, c='lightblue', s=30, alpha=0.3, label='全ステーション',
+               rasterized=True)
     
     # 在庫不足ステーション
-    ax.scatter(low_stock['longitude'], low_stock['latitude'], c='orange', s=50, alpha=0.5, label='在庫3台以下')
+    ax.scatter(lon_ls, lat_ls, c='orange', s=50, alpha=0.5, label='在庫3台以下')
     
     # クラスタ化されたエリア
     cluster_mask = labels >= 0
     if cluster_mask.any():
-        ax.scatter(low_stock.loc[cluster_mask, 'longitude'], 
-                  low_stock.loc[cluster_mask, 'latitude'],
+        ax.scatter(lon_ls[cluster_mask], lat_ls[cluster_mask],
                   c='red', s=100, alpha=0.8, marker='X', 
                   edgecolors='darkred', linewidth=2, label='検出: 利用困難エリア')
     
@@ -181,7 +244,6 @@ if len(low_stock) > 10:
     
     plt.tight_layout()
     plt.savefig('cluster_low_stock.png', dpi=150, bbox_inches='tight')
-    plt.close()
     print("✓ cluster_low_stock.png を生成しました")
 else:
     print("⚠ データ不足のため DBSCAN スキップ")
@@ -191,31 +253,20 @@ else:
 # ========================================
 print("\n[4/5] Space Saving法によるハブステーション検出中...")
 
-# ステーション別の変動量を計算
-station_stats = df.groupby('station_name').agg({
-    'free_bikes': ['mean', 'std', 'min', 'max'],
-    'latitude': 'first',
-    'longitude': 'first'
-}).reset_index()
-
-station_stats.columns = ['station_name', 'mean_bikes', 'std_bikes', 'min_bikes', 'max_bikes', 'latitude', 'longitude']
-station_stats['volatility'] = station_stats['std_bikes'].fillna(0)  # 変動性
-station_stats = station_stats.sort_values('volatility', ascending=False)
-
-top10_stations = station_stats.head(10)
+# ステーション別の変動量（標準偏差）を計算し、上位10件だけを部分選択（全件ソートはしない）
+volatility = df.groupby('station_name', sort=False, observed=True)['free_bikes'].std().fillna(0)  # 変動性
+top10_stations = volatility.nlargest(10).rename('volatility').reset_index()
 print(f"✓ Top 10 ハブステーションを検出")
 
 # ランキング可視化
-fig, ax = plt.subplots(figsize=(12, 8))
+ax = new_axes((12, 8))
 y_pos = np.arange(len(top10_stations))
 volatility_values = top10_stations['volatility'].values
 
 bars = ax.barh(y_pos, volatility_values, color='steelblue', alpha=0.8, edgecolor='navy', linewidth=1.5)
 
 # バーの上に値を表示
-for i, (bar, val) in enumerate(zip(bars, volatility_values)):
-    ax.text(val, bar.get_y() + bar.get_height()/2, 
-            f'{val:.2f}', va='center', ha='left', fontsize=10, fontweight='bold')
+ax.bar_label(bars, fmt='%.2f', fontsize=10, fontweight='bold')
 
 ax.set_yticks(y_pos)
 ax.set_yticklabels(top10_stations['station_name'], fontsize=10)
@@ -227,7 +278,6 @@ ax.grid(axis='x', alpha=0.3, linestyle='--')
 
 plt.tight_layout()
 plt.savefig('station_ranking.png', dpi=150, bbox_inches='tight')
-plt.close()
 print("✓ station_ranking.png を生成しました")
 
 # ========================================
@@ -236,10 +286,10 @@ print("✓ station_ranking.png を生成しました")
 print("\n[5/5] フロー分析グラフ生成中...")
 
 # 時刻別にグループ化（時間単位）
-df['hour'] = pd.to_datetime(df['timestamp']).dt.hour
+df['hour'] = df['timestamp'].dt.hour
 hourly_stats = df.groupby('hour')['free_bikes'].agg(['mean', 'std']).reset_index()
 
-fig, ax = plt.subplots(figsize=(12, 6))
+ax = new_axes((12, 6))
 
 # 平均を線プロット
 ax.plot(hourly_stats['hour'], hourly_stats['mean'], 'o-', linewidth=2.5, markersize=8, 
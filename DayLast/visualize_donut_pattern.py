@@ -12,6 +12,12 @@ from matplotlib import font_manager
 import matplotlib
 import sys
 
+try:
+    import numba  # noqa: F401  pandas の engine='numba' 集計に使用
+    GROUPBY_ENGINE = 'numba'
+except ImportError:  # numba は任意（未導入なら pandas 標準の Cython 集計）
+    GROUPBY_ENGINE = None
+
 # 日本語フォント設定を改善
 def setup_japanese_font():
     """日本語フォントを適切に設定"""
@@ -28,23 +34,50 @@ def setup_japanese_font():
     
 setup_japanese_font()
 
+# 出力解像度（プレゼン表示サイズでは150dpiで十分。300dpiは画素数4倍で保存が遅い）
+DPI = 150
+
+def new_axes(fig, figsize):
+    """使い回しのFigureをクリアしてサイズを変え、新しいAxesを返す"""
+    fig.clf()
+    fig.set_size_inches(figsize)
+    return fig.add_subplot()
+
 def visualize_donut_pattern():
     """ドーナツ化現象を複数の視点で可視化（個別ファイル保存）"""
     
     # データ読み込み
-    df = pd.read_csv('bike_log_donut.csv')
-    df['timestamp'] = pd.to_datetime(df['timestamp'])
+    df = pd.read_csv('bike_log_donut.csv', dtype={'area_type': 'category'})
+    df['timestamp'] = pd.to_datetime(df['timestamp'], format='%Y-%m-%d %H:%M:%S', cache=True)
     df['hour'] = df['timestamp'].dt.hour
     df['minute'] = df['timestamp'].dt.minute
+    # 集計キー順に一度だけ並べ替えておき、以降の groupby はソートを省略（sort=False でも結果は昇順）
+    df = df.sort_values(['area_type', 'station_name', 'hour'], kind='stable').reset_index(drop=True)
+    
+    # エリア別の部分データは一度だけ抽出し、統計サマリーで使い回す
+    downtown_df = df[df['area_type'].eq('downtown')]
+    suburb_df = df[df['area_type'].eq('suburb')]
+    
+    # ステーション×時刻の平均台数を両エリア分まとめて一度で集計（ヒートマップ用、numba があればJIT集計）
+    station_hourly = (
+        df.groupby(['area_type', 'station_name', 'hour'], sort=False, observed=True)['free_bikes']
+        .mean(engine=GROUPBY_ENGINE)
+        .unstack('hour')
+    )
     
     print("\n各グラフを個別に生成します...")
     
+    # 6枚のグラフで1つのFigureを使い回す（Figure生成・フォント解決のコストを1回に抑える）
+    fig = plt.figure(layout='constrained')
+    
     # 1. 時間帯別平均台数の推移（都心部 vs 郊外部）
     print("  [1/6] 時間帯別推移グラフ...")
-    fig1, ax1 = plt.subplots(figsize=(10, 6))
+    ax1 = new_axes(fig, (10, 6))
     
-    downtown_hourly = df[df['area_type'] == 'downtown'].groupby('hour')['free_bikes'].mean()
-    suburb_hourly = df[df['area_type'] == 'suburb'].groupby('hour')['free_bikes'].mean()
+    # エリア×時刻の平均台数は一度だけ集計し、推移・変動量・相関・統計サマリーの各グラフで共用
+    hourly = df.groupby(['area_type', 'hour'], sort=False, observed=True)['free_bikes'].mean().unstack(0)
+    downtown_hourly = hourly['downtown']
+    suburb_hourly = hourly['suburb']
     
     ax1.plot(downtown_hourly.index, downtown_hourly.values, 'o-', label='都心部（オフィス街）', 
              color='#e74c3c', linewidth=2.5, markersize=8)
@@ -61,13 +94,11 @@ def visualize_donut_pattern():
     ax1.legend(fontsize=10)
     ax1.grid(True, alpha=0.3)
     ax1.set_xticks(range(0, 24, 2))
-    plt.tight_layout()
-    plt.savefig('donut_1_time_series.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_1_time_series.png', dpi=DPI)
     
     # 2. 変動率の可視化（前時間帯との差分）
     print("  [2/6] 変動量グラフ...")
-    fig2, ax2 = plt.subplots(figsize=(10, 6))
+    ax2 = new_axes(fig, (10, 6))
     
     downtown_change = downtown_hourly.diff().fillna(0)
     suburb_change = suburb_hourly.diff().fillna(0)
@@ -86,64 +117,47 @@ def visualize_donut_pattern():
     ax2.grid(True, alpha=0.3, axis='y')
     ax2.set_xticks(range(0, 24, 2))
     ax2.set_xticklabels(range(0, 24, 2))
-    plt.tight_layout()
-    plt.savefig('donut_2_change_rate.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_2_change_rate.png', dpi=DPI)
     
     # 3. ステーション別ヒートマップ（都心部）
     print("  [3/6] 都心部ヒートマップ...")
-    fig3, ax3 = plt.subplots(figsize=(12, 8))
+    ax3 = new_axes(fig, (12, 8))
     
-    downtown_pivot = df[df['area_type'] == 'downtown'].pivot_table(
-        values='free_bikes', 
-        index='station_name', 
-        columns='hour', 
-        aggfunc='mean'
-    )
+    downtown_pivot = station_hourly.loc['downtown']
     
     sns.heatmap(downtown_pivot, cmap='RdYlGn', ax=ax3, cbar_kws={'label': '利用可能台数'})
     ax3.set_title('都心部ステーション時間別ヒートマップ', fontsize=14, fontweight='bold')
     ax3.set_xlabel('時刻', fontsize=12)
     ax3.set_ylabel('ステーション名', fontsize=12)
-    plt.tight_layout()
-    plt.savefig('donut_3_downtown_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_3_downtown_heatmap.png', dpi=DPI)
     
     # 4. ステーション別ヒートマップ（郊外部）
     print("  [4/6] 郊外部ヒートマップ...")
-    fig4, ax4 = plt.subplots(figsize=(12, 8))
+    ax4 = new_axes(fig, (12, 8))
     
-    suburb_pivot = df[df['area_type'] == 'suburb'].pivot_table(
-        values='free_bikes', 
-        index='station_name', 
-        columns='hour', 
-        aggfunc='mean'
-    )
+    suburb_pivot = station_hourly.loc['suburb']
     
     sns.heatmap(suburb_pivot, cmap='RdYlGn', ax=ax4, cbar_kws={'label': '利用可能台数'})
     ax4.set_title('郊外部ステーション時間別ヒートマップ', fontsize=14, fontweight='bold')
     ax4.set_xlabel('時刻', fontsize=12)
     ax4.set_ylabel('ステーション名', fontsize=12)
-    plt.tight_layout()
-    plt.savefig('donut_4_suburb_heatmap.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_4_suburb_heatmap.png', dpi=DPI)
     
     # 5. 逆相関の証明（散布図）
     print("  [5/6] 相関散布図...")
-    fig5, ax5 = plt.subplots(figsize=(10, 8))
+    ax5 = new_axes(fig, (10, 8))
     
-    hourly_avg = df.groupby(['hour', 'area_type'])['free_bikes'].mean().unstack()
-    
-    ax5.scatter(hourly_avg['downtown'], hourly_avg['suburb'], 
-                s=200, alpha=0.6, c=range(24), cmap='twilight')
+    # 点の色は時刻（散布図自体をカラーバーのマッピングとして使う）
+    sc = ax5.scatter(downtown_hourly, suburb_hourly, 
+                     s=200, alpha=0.6, c=downtown_hourly.index, cmap='twilight', vmin=0, vmax=23)
     
     # 相関係数を計算
-    correlation = hourly_avg['downtown'].corr(hourly_avg['suburb'])
+    correlation = downtown_hourly.corr(suburb_hourly)
     
-    # トレンドライン
-    z = np.polyfit(hourly_avg['downtown'], hourly_avg['suburb'], 1)
-    p = np.poly1d(z)
-    ax5.plot(hourly_avg['downtown'], p(hourly_avg['downtown']), 
+    # トレンドライン（直線なので両端の2点だけ評価して描画）
+    intercept, slope = np.polynomial.polynomial.polyfit(downtown_hourly, suburb_hourly, 1)
+    x_end = np.array([downtown_hourly.min(), downtown_hourly.max()])
+    ax5.plot(x_end, intercept + slope * x_end, 
              "r--", alpha=0.8, linewidth=2)
     
     ax5.set_xlabel('都心部 平均台数', fontsize=12)
@@ -153,44 +167,35 @@ def visualize_donut_pattern():
     ax5.grid(True, alpha=0.3)
     
     # カラーバーで時刻を示す
-    sm = plt.cm.ScalarMappable(cmap='twilight', 
-                                norm=plt.Normalize(vmin=0, vmax=23))
-    sm.set_array([])
-    cbar = plt.colorbar(sm, ax=ax5)
+    cbar = fig.colorbar(sc, ax=ax5)
     cbar.set_label('時刻', fontsize=10)
-    plt.tight_layout()
-    plt.savefig('donut_5_correlation.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_5_correlation.png', dpi=DPI)
     
     # 6. 統計サマリー
     print("  [6/6] 統計サマリー...")
-    fig6, ax6 = plt.subplots(figsize=(10, 8))
+    ax6 = new_axes(fig, (10, 8))
     ax6.axis('off')
     
-    # 統計情報を計算
-    downtown_stats = df[df['area_type'] == 'downtown'].groupby('hour')['free_bikes'].agg(['mean', 'std', 'min', 'max'])
-    suburb_stats = df[df['area_type'] == 'suburb'].groupby('hour')['free_bikes'].agg(['mean', 'std', 'min', 'max'])
-    
-    # 最小・最大時刻を特定
-    downtown_min_hour = downtown_stats['mean'].idxmin()
-    downtown_max_hour = downtown_stats['mean'].idxmax()
-    suburb_min_hour = suburb_stats['mean'].idxmin()
-    suburb_max_hour = suburb_stats['mean'].idxmax()
+    # 最小・最大時刻を特定（[1/6] で集計済みの時間帯別平均を再利用）
+    downtown_min_hour = downtown_hourly.idxmin()
+    downtown_max_hour = downtown_hourly.idxmax()
+    suburb_min_hour = suburb_hourly.idxmin()
+    suburb_max_hour = suburb_hourly.idxmax()
     
     summary_text = f"""
 【ドーナツ化現象の統計サマリー】
 
 ■ 都心部（オフィス街）
-  • 最少時刻: {downtown_min_hour}時 ({downtown_stats.loc[downtown_min_hour, 'mean']:.1f}台)
-  • 最多時刻: {downtown_max_hour}時 ({downtown_stats.loc[downtown_max_hour, 'mean']:.1f}台)
-  • 変動幅: {downtown_stats['mean'].max() - downtown_stats['mean'].min():.1f}台
-  • 平均台数: {df[df['area_type']=='downtown']['free_bikes'].mean():.1f}台
+  • 最少時刻: {downtown_min_hour}時 ({downtown_hourly[downtown_min_hour]:.1f}台)
+  • 最多時刻: {downtown_max_hour}時 ({downtown_hourly[downtown_max_hour]:.1f}台)
+  • 変動幅: {downtown_hourly.max() - downtown_hourly.min():.1f}台
+  • 平均台数: {downtown_df['free_bikes'].mean():.1f}台
 
 ■ 郊外部（住宅街）
-  • 最少時刻: {suburb_min_hour}時 ({suburb_stats.loc[suburb_min_hour, 'mean']:.1f}台)
-  • 最多時刻: {suburb_max_hour}時 ({suburb_stats.loc[suburb_max_hour, 'mean']:.1f}台)
-  • 変動幅: {suburb_stats['mean'].max() - suburb_stats['mean'].min():.1f}台
-  • 平均台数: {df[df['area_type']=='suburb']['free_bikes'].mean():.1f}台
+  • 最少時刻: {suburb_min_hour}時 ({suburb_hourly[suburb_min_hour]:.1f}台)
+  • 最多時刻: {suburb_max_hour}時 ({suburb_hourly[suburb_max_hour]:.1f}台)
+  • 変動幅: {suburb_hourly.max() - suburb_hourly.min():.1f}台
+  • 平均台数: {suburb_df['free_bikes'].mean():.1f}台
 
 ■ 相関分析
   • 相関係数: {correlation:.3f} (負の相関)
@@ -206,9 +211,8 @@ def visualize_donut_pattern():
              fontsize=11, verticalalignment='top',
              bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.3))
     
-    plt.tight_layout()
-    plt.savefig('donut_6_summary.png', dpi=300, bbox_inches='tight')
-    plt.close()
+    fig.savefig('donut_6_summary.png', dpi=DPI)
+    plt.close(fig)
     
     print("\n✓ すべてのグラフを個別ファイルとして保存しました:")
     print("  - donut_1_time_series.png")
@@ -1,13 +1,17 @@
 from fastapi import FastAPI, Query
 from fastapi import HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from pydantic import BaseModel
 from rtree import index
-import requests
-import time
+import asyncio
+import httpx
 from typing import List, Optional, Tuple, Dict
 import math
+import numpy as np
+from collections import defaultdict
+from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 from datetime import datetime
 import json
@@ -15,8 +19,30 @@ try:
     import yaml  # type: ignore
 except Exception:  # pragma: no cover - optional dependency
     yaml = None
+try:
+    from cachetools import TTLCache  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    TTLCache = None
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+try:
+    import ijson  # type: ignore
+except Exception:  # pragma: no cover - optional dependency
+    ijson = None
 
-app = FastAPI()
+
+class _ORJSONResponse(JSONResponse):
+    """orjson で直接 bytes にシリアライズする JSONResponse（orjson 導入時のみ使用）。"""
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+_JSONResponse = _ORJSONResponse if orjson is not None else JSONResponse
+
+app = FastAPI(default_response_class=_JSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],  # 開発用。必要に応じて制限
@@ -36,23 +62,114 @@ OVERPASS_URLS = [
 ]
 
 
-def _overpass_request(query: str, timeout_s: int = 60, retries: int = 2) -> dict:
-    """Call Overpass with retries and endpoint fallback. Uses POST as recommended.
+# gzip 圧縮応答を明示的に要求（bbox の大きな JSON で転送量が大きく減る。展開は httpx が自動で行う）
+# User-Agent は Overpass 運営側が利用元を識別できるようアプリ固有の値にする
+OVERPASS_HEADERS = {
+    "Accept-Encoding": "gzip, deflate",
+    "User-Agent": "algo2-midpoint-recommender/1.0 (httpx)",
+}
+
+
+# Overpass 用の共有 HTTP クライアント（初回利用時に生成し、リクエスト間で接続を使い回す）
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """共有クライアントを返す。startup フックが走らない場合（with なしの TestClient など）もここで生成する。"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.AsyncClient(timeout=60, headers=OVERPASS_HEADERS)
+    return _http_client
+
+
+@app.on_event("startup")
+async def _open_http_client() -> None:
+    _get_http_client()
+
+
+@app.on_event("shutdown")
+async def _close_http_client() -> None:
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+# Overpass 応答のメモリキャッシュ（クエリ文字列をキーに10分保持）。cachetools 未導入時は無効
+# 参照・更新はイベントループ上で await を挟まずに行うため、追加のロックは不要
+_overpass_cache = TTLCache(maxsize=1024, ttl=600) if TTLCache is not None else None
+
+
+# 非圧縮でこれ未満（Content-Length）の応答は r.json() で一括パース、以上／不明は ijson で逐次パース
+# gzip/deflate で圧縮された応答の Content-Length は圧縮後のサイズで、展開後は数倍〜10倍になりうるため、
+# 圧縮応答は大きさによらず逐次パースする
+STREAM_PARSE_MIN_BYTES = 1_000_000
+
+
+class _AsyncByteReader:
+    """httpx のストリーミング応答を ijson.items_async が読める read() 付きオブジェクトに包む。"""
+
+    def __init__(self, response: httpx.Response):
+        self._chunks = response.aiter_bytes()
+
+    async def read(self, n: int = -1) -> bytes:
+        if n == 0:  # ijson は最初に read(0) で bytes/str を判定する
+            return b""
+        return await anext(self._chunks, b"")
+
+
+async def _overpass_post(base: str, query: str, timeout_s: int) -> dict:
+    """Single POST to one Overpass endpoint; raises on HTTP error.
+    Large, compressed (Content-Length is the compressed size) or unknown-size bodies are
+    stream-parsed element by element with ijson,
+    so the raw JSON text is never held in memory at once.
+    """
+    async with _get_http_client().stream("POST", base, data={"data": query}, timeout=timeout_s) as r:
+        r.raise_for_status()
+        size = r.headers.get("content-length")
+        encoded = r.headers.get("content-encoding", "identity").lower() != "identity"
+        if ijson is None or (not encoded and size is not None and int(size) < STREAM_PARSE_MIN_BYTES):
+            await r.aread()
+            return r.json()
+        elements = [
+            el async for el in ijson.items_async(_AsyncByteReader(r), "elements.item", use_float=True)
+        ]
+        return {"elements": elements}
+
+
+async def _overpass_request(query: str, timeout_s: int = 60, retries: int = 2) -> dict:
+    """Call Overpass with retries, racing all endpoints concurrently. Uses POST as recommended.
+    The first endpoint to answer successfully wins and the others are cancelled,
+    so one busy mirror no longer adds its full timeout to the latency.
+    Identical queries are answered from an in-process TTL cache when available.
     Returns parsed JSON or raises on final failure.
     """
+    if _overpass_cache is not None:
+        cached = _overpass_cache.get(query)
+        if cached is not None:
+            return cached
     last_err: Exception | None = None
     for attempt in range(retries + 1):
-        for base in OVERPASS_URLS:
-            try:
-                r = requests.post(base, data={"data": query}, timeout=timeout_s)
-                r.raise_for_status()
-                return r.json()
-            except Exception as e:  # noqa: BLE001 keep broad for network issues
-                last_err = e
-                # brief backoff between endpoints
-                time.sleep(0.2)
+        pending = {asyncio.create_task(_overpass_post(base, query, timeout_s)) for base in OVERPASS_URLS}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, timeout=timeout_s, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    last_err = TimeoutError("Overpass request timed out")
+                    break
+                for task in done:
+                    err = task.exception()
+                    if err is None:
+                        data = task.result()
+                        if _overpass_cache is not None:
+                            _overpass_cache[query] = data
+                        return data
+                    last_err = err  # keep broad for network issues; wait for the next endpoint
+        finally:
+            for task in pending:
+                task.cancel()
         # exponential backoff between attempts
-        time.sleep(0.6 * (2 ** attempt))
+        await asyncio.sleep(0.6 * (2 ** attempt))
     # If all fail, raise
     raise last_err or RuntimeError("Overpass request failed")
 
@@ -63,6 +180,37 @@ SUPPORTED_AMENITIES = {
 }
 
 
+def _parse_categories(category: str) -> List[str]:
+    """カンマ区切りのカテゴリ指定を対応カテゴリのリストに変換（重複・非対応は除外、空なら cafe）。
+    順序を正規化してクエリ文字列（=キャッシュキー）を共有しやすくする。"""
+    cats = {c.strip() for c in category.split(",")} & SUPPORTED_AMENITIES
+    return sorted(cats) or ["cafe"]
+
+
+@lru_cache(maxsize=256)
+def _amenity_template(categories: Tuple[str, ...]) -> str:
+    """カテゴリの組ごとにクエリの骨格を一度だけ組み立ててキャッシュする（範囲は {area} のまま残す）。"""
+    blocks = "\n".join(
+        f'        {kind}["amenity"="{c}"]{{area}};'
+        for c in categories
+        for kind in ("node", "way", "relation")
+    )
+    # 軽量化のため 'out center' を使用（ways/relations に center を付与）
+    return f"""
+    [out:json][timeout:60];
+    (
+{blocks}
+    );
+    out center;
+    """
+
+
+def _amenity_query(categories: List[str], area: str) -> str:
+    """複数カテゴリの node/way/relation セレクタを1つの union にまとめた Overpass クエリを組み立てる。
+    area は '(around:r,lat,lon)' や '(south,west,north,east)' などの範囲フィルタ。"""
+    return _amenity_template(tuple(categories)).format(area=area)
+
+
 class Recommendation(BaseModel):
     id: int
     name: str
@@ -96,32 +244,45 @@ def _save_payload(data: dict, prefix: str = "dataset", fmt: str = "json", name:
         return path
     # default json
     path = DATA_DIR / f"{stem}.json"
+    if orjson is not None:
+        path.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY))
+        return path
     with path.open("w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
     return path
 
 
-def fetch_pois(lat: float, lon: float, category: str, radius_m: int) -> List[dict]:
-    """Overpass APIで中点周辺のPOIを取得。nodes/ways/relationsを 'out geom' で取得し、
-    ways/relations は幾何から重心を推定して座標化する。"""
+def _overpass_timeout(radius_m: int) -> int:
+    """検索半径に応じた Overpass のタイムアウト秒。要素数はおおよそ面積（半径の2乗）に比例するので、
+    小さなクエリは早めに見切る（最大60秒）。"""
+    return int(min(60, 8 + (radius_m / 1000) ** 2 * 6))
+
+
+async def fetch_pois(lat: float, lon: float, categories: List[str], radius_m: int, timeout_s: int = 60,
+                     retries: int = 2) -> List[dict]:
+    """Overpass APIで中点周辺のPOIを取得。複数カテゴリも1回のクエリ（単一 union）で取得し、
+    ways/relations は 'out center' の中心点で座標化する。retries は _overpass_request の再試行回数。"""
     # amenity タグのみ対応（無料・汎用）
-    if category not in SUPPORTED_AMENITIES:
-        category = "cafe"
+    categories = [c for c in categories if c in SUPPORTED_AMENITIES] or ["cafe"]
 
-    # 軽量化のため 'out center' を使用（ways/relations に center を付与）
-    query = f"""
-    [out:json][timeout:60];
-    (
-        node["amenity"="{category}"](around:{radius_m},{lat},{lon});
-        way["amenity"="{category}"](around:{radius_m},{lat},{lon});
-        relation["amenity"="{category}"](around:{radius_m},{lat},{lon});
-    );
-    out center;
-    """
-    data = _overpass_request(query, timeout_s=60, retries=2)
+    # 近い地点からの呼び出しが同じクエリ（=キャッシュ）を共有できるよう量子化
+    # 座標は小数4桁（約10m）に丸め、半径は丸めによる中心のずれ（最大約8m）を足してから
+    # 100m単位に切り上げる（呼び出し側の円の内側にある POI を取りこぼさないため）
+    lat = round(lat, 4)
+    lon = round(lon, 4)
+    radius_m = int(math.ceil((radius_m + 10) / 100.0) * 100)
+
+    query = _amenity_query(categories, f"(around:{radius_m},{lat},{lon})")
+    data = await _overpass_request(query, timeout_s=timeout_s, retries=retries)
 
     pois: List[dict] = []
+    seen_ids = set()
     for el in data.get("elements", []):
+        # 同一要素の重複を除去（要素IDは種別ごとの採番なので type と組にする）
+        el_key = (el.get("type"), el.get("id"))
+        if el_key in seen_ids:
+            continue
+        seen_ids.add(el_key)
         tags = el.get("tags", {})
         name = tags.get("name") or "Unnamed"
         amenity = tags.get("amenity")
@@ -151,27 +312,19 @@ def fetch_pois(lat: float, lon: float, category: str, radius_m: int) -> List[dic
 def _polygon_centroid(latlon: List[Tuple[float, float]]) -> Tuple[float, float]:
     """多角形（閉じた経緯度列）の重心を計算（平面近似）。ざっくりだがPOI位置の改善に有効。"""
     # 2D平面に投影してから計算（小地域前提）
-    # x=lon, y=lat として多角形の重心を求める
-    area = 0.0
-    cx = 0.0
-    cy = 0.0
-    pts = [(p[1], p[0]) for p in latlon]  # (x=lon, y=lat)
-    for i in range(len(pts) - 1):
-        x0, y0 = pts[i]
-        x1, y1 = pts[i + 1]
-        cross = x0 * y1 - x1 * y0
-        area += cross
-        cx += (x0 + x1) * cross
-        cy += (y0 + y1) * cross
+    # x=lon, y=lat として多角形の重心を求める（辺ごとの外積を配列演算でまとめて計算）
+    arr = np.asarray(latlon, dtype=np.float64)
+    x = arr[:, 1]
+    y = arr[:, 0]
+    cross = x[:-1] * y[1:] - x[1:] * y[:-1]
+    area = cross.sum()
     if abs(area) < 1e-9:
         # 面積ゼロ（線状等）の場合は単純平均
-        xs = [p[0] for p in pts]
-        ys = [p[1] for p in pts]
-        return (sum(ys) / len(ys), sum(xs) / len(xs))
+        return (float(y.mean()), float(x.mean()))
     area *= 0.5
-    cx /= (6.0 * area)
-    cy /= (6.0 * area)
-    return (cy, cx)
+    cx = ((x[:-1] + x[1:]) * cross).sum() / (6.0 * area)
+    cy = ((y[:-1] + y[1:]) * cross).sum() / (6.0 * area)
+    return (float(cy), float(cx))
 
 
 def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
@@ -185,32 +338,107 @@ def _haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     return R * c
 
 
+def _haversine_m_vec(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """_haversine_m の NumPy 版。配列同士はブロードキャストされる（例: lat[:, None] と lat[None, :] で全ペア）。"""
+    R = 6371000.0
+    phi1 = np.radians(lat1)
+    phi2 = np.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(lon2) - np.radians(lon1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def _dedup_pois(pois: List[dict], min_dist_m: float = 30.0) -> List[dict]:
+    """同名（大文字小文字・前後空白を無視）かつ min_dist_m 以内の POI を重複とみなして除去。
+    先に現れたものを残し、元の順序を保つ。同名グループ内の距離は行列で一括計算する。"""
+    groups: Dict[str, List[int]] = defaultdict(list)
+    for i, p in enumerate(pois):
+        groups[(p.get("name") or "Unnamed").strip().lower()].append(i)
+
+    keep: List[int] = []
+    for members in groups.values():
+        if len(members) == 1:
+            keep.append(members[0])
+            continue
+        lats = np.array([pois[i]["lat"] for i in members])
+        lons = np.array([pois[i]["lon"] for i in members])
+        near = _haversine_m_vec(lats[:, None], lons[:, None], lats[None, :], lons[None, :]) < min_dist_m
+        kept = np.zeros(len(members), dtype=bool)
+        for j in range(len(members)):
+            # 既に残した同名POIのいずれとも近くなければ残す
+            if not (near[j] & kept).any():
+                kept[j] = True
+        keep.extend(m for m, k in zip(members, kept) if k)
+    keep.sort()
+    return [pois[i] for i in keep]
+
+
+def _haversine_m_prepared(phi1: float, lam1: float, cos_phi1: float, lat2: float, lon2: float,
+                          *, _sin=math.sin, _cos=math.cos, _sqrt=math.sqrt, _atan2=math.atan2,
+                          _rad=math.radians) -> float:
+    """基準点側の radians/cos を事前計算済みで受け取る _haversine_m（同じ基準点で多数回呼ぶループ用）。
+    math 関数はデフォルト引数に束縛してグローバル・属性参照を省く。"""
+    phi2 = _rad(lat2)
+    a = _sin((phi2 - phi1) / 2) ** 2 + cos_phi1 * _cos(phi2) * _sin((_rad(lon2) - lam1) / 2) ** 2
+    return 6371000.0 * 2 * _atan2(_sqrt(a), _sqrt(1 - a))
+
+
 def linear_search_nearest(pois: List[dict], target_lat: float, target_lon: float, k: int) -> List[int]:
     """線形探索で最近傍k件を取得（比較用）"""
+    phi1 = math.radians(target_lat)
+    lam1 = math.radians(target_lon)
+    cos_phi1 = math.cos(phi1)
     distances = []
     for i, p in enumerate(pois):
-        dist = _haversine_m(target_lat, target_lon, p["lat"], p["lon"])
+        dist = _haversine_m_prepared(phi1, lam1, cos_phi1, p["lat"], p["lon"])
         distances.append((dist, i))
     distances.sort(key=lambda x: x[0])
     return [idx for _, idx in distances[:k]]
 
 
+def nearest_k(pois: List[dict], target_lat: float, target_lon: float, k: int) -> List[int]:
+    """haversine 距離を一括計算し、argpartition で最近傍k件を近い順に返す。"""
+    lats = np.array([p["lat"] for p in pois])
+    lons = np.array([p["lon"] for p in pois])
+    d = _haversine_m_vec(target_lat, target_lon, lats, lons)
+    top = np.argpartition(d, k - 1)[:k]
+    return top[np.argsort(d[top])].tolist()
+
+
 def build_rtree(pois: List[dict]) -> Tuple[index.Index, List[dict]]:
-    """POI を R-tree にインデックス。"""
-    idx = index.Index()
-    for i, p in enumerate(pois):
-        # 点を最小矩形として登録（lon, lat, lon, lat）
-        idx.insert(i, (p["lon"], p["lat"], p["lon"], p["lat"]))
+    """POI を R-tree にインデックス。ストリーム入力でバルクロード（STRパッキング）する。"""
+    props = index.Property()
+    props.leaf_capacity = 50
+    props.fill_factor = 0.9
+    if not pois:
+        # 空ストリームのバルクロードは libspatialindex がエラーにするため空インデックスを返す
+        return index.Index(interleaved=True, properties=props), pois
+    # 点を最小矩形として登録（lon, lat, lon, lat）
+    stream = ((i, (p["lon"], p["lat"], p["lon"], p["lat"]), None) for i, p in enumerate(pois))
+    idx = index.Index(stream, interleaved=True, properties=props)
     return idx, pois
 
 
+def rtree_nearest_k(idx: index.Index, pois: List[dict], target_lat: float, target_lon: float, k: int) -> List[int]:
+    """R-tree で最近傍k件を取得し、haversine 距離で近い順に並べ直して返す。
+    idx.nearest は libspatialindex の優先度付きキューによる Best-First 探索（MBR の mindist 順に展開）で、
+    同距離があると k 件を超えて返すため islice で打ち切る。"""
+    cand = list(islice(idx.nearest((target_lon, target_lat, target_lon, target_lat),
+                                   num_results=k, objects=False), k))
+    d = _haversine_m_vec(target_lat, target_lon,
+                         np.array([pois[i]["lat"] for i in cand]), np.array([pois[i]["lon"] for i in cand]))
+    return [cand[j] for j in np.argsort(d, kind="stable")]
+
+
 @app.get("/recommend", response_model=RecommendResponse)
-def recommend(
+async def recommend(
     lat1: float = Query(..., description="Person A latitude"),
     lon1: float = Query(..., description="Person A longitude"),
     lat2: float = Query(..., description="Person B latitude"),
     lon2: float = Query(..., description="Person B longitude"),
-    category: str = Query("cafe", description="OSM amenity category, e.g., cafe, restaurant"),
+    category: str = Query("cafe", description="OSM amenity category, e.g., cafe, restaurant (comma-separated for several)"),
     limit: int = Query(10, ge=1, le=50),
     radius_m: Optional[int] = Query(None, ge=100, le=10000, description="Search radius in meters; default auto"),
     save: bool = Query(False, description="If true, save the response on server"),
@@ -218,7 +446,7 @@ def recommend(
     name: Optional[str] = Query(None, description="Optional file name (without extension) when saving")
 ):
     """
-    二人の中間地点から、指定カテゴリのスポットをR-treeで近い順に返す。
+    二人の中間地点から、指定カテゴリのスポットを近い順に返す（大圏距離の一括計算で上位k件を選択）。
     戻り値は座標と簡易メタデータのみ（距離は返さない）。
     """
     # 中間地点
@@ -227,38 +455,49 @@ def recommend(
 
     # 半径: 二人間の距離の半分 + 400m を基準（800m〜3000mの範囲にクランプ）
     auto_r = int(_haversine_m(lat1, lon1, lat2, lon2) / 2 + 400)
-    r_m = radius_m or max(800, min(3000, auto_r))
+    full_r = radius_m or max(800, min(3000, auto_r))
+    # 自動半径のときは、欲しい件数が少ないほど半径を絞って小さなクエリから始める
+    r_m = full_r if radius_m else min(full_r, max(400, int(math.sqrt(limit) * 200)))
+    categories = _parse_categories(category)
 
+    # 名前と近接で重複除去（30m 以内に同名があるならスキップ）は取得のたびに行い、
+    # 件数の判定は重複除去後の件数で行う
     try:
-        pois = fetch_pois(mid_lat, mid_lon, category, r_m)
+        shrunk = False
+        try:
+            # 最初の試行は再試行なしで早めに見切り、タイムアウトなら半径を縮める
+            pois = await fetch_pois(mid_lat, mid_lon, categories, r_m, timeout_s=_overpass_timeout(r_m),
+                                    retries=0)
+        except (httpx.TimeoutException, TimeoutError):
+            # 大きすぎるクエリは早めに打ち切り、半径を縮めて1回だけ再試行
+            shrunk = True
+            r_m = int(r_m * 0.6)
+            pois = await fetch_pois(mid_lat, mid_lon, categories, r_m, timeout_s=_overpass_timeout(r_m))
+        except httpx.HTTPError:
+            # タイムアウト以外の一時的な障害は、同じ半径で通常どおり再試行する
+            pois = await fetch_pois(mid_lat, mid_lon, categories, r_m, timeout_s=_overpass_timeout(r_m))
+        deduped = _dedup_pois(pois)
+        if not shrunk and len(deduped) < limit and r_m < full_r:
+            # 絞った半径で件数が足りなければ本来の半径で取り直す
+            r_m = full_r
+            deduped = _dedup_pois(
+                await fetch_pois(mid_lat, mid_lon, categories, r_m, timeout_s=_overpass_timeout(r_m)))
     except Exception as e:
         # Overpass障害時は 200 で空配列を返し、クライアントで再試行可能にする
         # ログだけ残す
         print(f"Overpass error: {e}")
         return {"midpoint": (mid_lat, mid_lon), "recommendations": []}
-    if not pois:
+    if not deduped:
         return {"midpoint": (mid_lat, mid_lon), "recommendations": []}
 
-    # 名前と近接で重複除去
-    deduped: List[dict] = []
-    seen: Dict[str, List[Tuple[float, float]]] = {}
-    for p in pois:
-        key = (p.get("name") or "Unnamed").strip().lower()
-        lst = seen.setdefault(key, [])
-        # 30m 以内に同名があるならスキップ
-        if any(_haversine_m(p["lat"], p["lon"], la, lo) < 30 for (la, lo) in lst):
-            continue
-        lst.append((p["lat"], p["lon"]))
-        deduped.append(p)
-
-    idx, items = build_rtree(deduped)
-    # R-tree で最近傍 k 件
-    k = min(limit, len(items))
-    nearest_ids = list(idx.nearest((mid_lon, mid_lat, mid_lon, mid_lat), k))
+    # 1回きりの検索で k（最大50）件だけ欲しいので、R-tree の構築（O(N log N)）より
+    # 大圏距離の一括計算＋argpartition（O(N)）が件数によらず速く、順位も正確
+    k = min(limit, len(deduped))
+    nearest_ids = nearest_k(deduped, mid_lat, mid_lon, k)
 
     recs = []
     for i in nearest_ids:
-        p = items[i]
+        p = deduped[i]
         # 距離は返さず、座標とカテゴリ/名前のみ
         recs.append({
             "id": int(p["id"]),
@@ -284,7 +523,7 @@ def recommend(
                 name=name,
             )
             # expose location in header-like field
-            return JSONResponse(content=result, headers={"X-Saved-Path": str(saved.name)})
+            return _JSONResponse(content=result, headers={"X-Saved-Path": str(saved.name)})
         except HTTPException:
             raise
         except Exception as e:  # pragma: no cover
@@ -300,12 +539,12 @@ class BBoxResponse(BaseModel):
 
 
 @app.get("/search_bbox", response_model=BBoxResponse)
-def search_bbox(
+async def search_bbox(
     min_lat: float = Query(..., description="South latitude"),
     min_lon: float = Query(..., description="West longitude"),
     max_lat: float = Query(..., description="North latitude"),
     max_lon: float = Query(..., description="East longitude"),
-    category: str = Query("cafe", description="OSM amenity category"),
+    category: str = Query("cafe", description="OSM amenity category (comma-separated for several)"),
     save: bool = Query(False, description="If true, save the response on server"),
     fmt: Optional[str] = Query("json", description="Save format json|yaml (when save=true)"),
     name: Optional[str] = Query(None, description="Optional file name (without extension) when saving"),
@@ -313,27 +552,29 @@ def search_bbox(
     """
     指定した矩形範囲（bbox）内の指定カテゴリのPOIを全件取得して返す。
     """
-    if category not in SUPPORTED_AMENITIES:
-        category = "cafe"
+    categories = _parse_categories(category)
+
+    # キャッシュ共有のため bbox 角を小数3桁（約100m）に量子化（外側へ丸めて範囲を縮めない）
+    q_south = math.floor(min_lat * 1000) / 1000
+    q_west = math.floor(min_lon * 1000) / 1000
+    q_north = math.ceil(max_lat * 1000) / 1000
+    q_east = math.ceil(max_lon * 1000) / 1000
 
     # Overpass bbox は (south, west, north, east) の順
-    query = f"""
-    [out:json][timeout:60];
-    (
-        node["amenity"="{category}"]({min_lat},{min_lon},{max_lat},{max_lon});
-        way["amenity"="{category}"]({min_lat},{min_lon},{max_lat},{max_lon});
-        relation["amenity"="{category}"]({min_lat},{min_lon},{max_lat},{max_lon});
-    );
-    out center;
-    """
+    query = _amenity_query(categories, f"({q_south},{q_west},{q_north},{q_east})")
     try:
-        data = _overpass_request(query, timeout_s=60, retries=2)
+        data = await _overpass_request(query, timeout_s=60, retries=2)
     except Exception as e:
         print(f"Overpass error: {e}")
         return {"bbox": (min_lat, min_lon, max_lat, max_lon), "pois": []}
 
     pois: List[dict] = []
+    seen_ids = set()
     for el in data.get("elements", []):
+        el_key = (el.get("type"), el.get("id"))
+        if el_key in seen_ids:
+            continue
+        seen_ids.add(el_key)
         tags = el.get("tags", {})
         name = tags.get("name") or "Unnamed"
         amenity = tags.get("amenity")
@@ -347,21 +588,22 @@ def search_bbox(
             lon_i = float(el["center"].get("lon"))
         if lat_i is None or lon_i is None:
             continue
+        # 量子化で広げた分を除き、指定された bbox 内のみ返す
+        if not (min_lat <= lat_i <= max_lat and min_lon <= lon_i <= max_lon):
+            continue
 
+        # Recommendation と同じ形の dict をそのまま返す（件数が多いため POI ごとのモデル生成・検証は行わない）
         pois.append({
-            "id": el.get("id"),
+            "id": int(el["id"]),
             "name": name,
             "category": amenity,
-            "lat": float(lat_i),
-            "lon": float(lon_i),
+            "lat": lat_i,
+            "lon": lon_i,
         })
 
-    # 型整形
-    out_items = [Recommendation(id=int(p["id"]), name=p["name"], category=p.get("category"), lat=p["lat"], lon=p["lon"]) for p in pois]
-    result = {"bbox": (min_lat, min_lon, max_lat, max_lon), "pois": out_items}
+    result = {"bbox": (min_lat, min_lon, max_lat, max_lon), "pois": pois}
     if save:
         try:
-            # convert pydantic models to plain dicts where needed
             serializable = {
                 "type": "search_bbox",
                 "params": {
@@ -370,17 +612,17 @@ def search_bbox(
                 },
                 "result": {
                     "bbox": result["bbox"],
-                    "pois": [r.model_dump() if hasattr(r, "model_dump") else r.dict() for r in out_items],
+                    "pois": pois,
                 },
             }
             saved = _save_payload(serializable, prefix="bbox", fmt=(fmt or "json"), name=name)
-            return JSONResponse(content=result, headers={"X-Saved-Path": str(saved.name)})
+            return _JSONResponse(content=result, headers={"X-Saved-Path": str(saved.name)})
         except HTTPException:
             raise
         except Exception as e:  # pragma: no cover
             print(f"Save error: {e}")
-            return result
-    return result
+    # response_model は OpenAPI スキーマ用に残し、Response を直接返して応答時の再検証を省く
+    return _JSONResponse(content=result)
 
 
 # --- Explicit save/list APIs ---
@@ -419,8 +661,8 @@ def get_dataset(file_name: str):
         cand = DATA_DIR / (safe if safe.endswith(ext) else safe + ext)
         if cand.exists():
             if cand.suffix == ".json":
-                with cand.open("r", encoding="utf-8") as f:
-                    return JSONResponse(json.load(f))
+                # 保存済みファイルは妥当な JSON なので、再パースせずそのまま返す
+                return Response(content=cand.read_bytes(), media_type="application/json")
             # YAML -> plain text for easy download/inspection
             return FileResponse(path=str(cand), media_type="text/yaml")
     raise HTTPException(status_code=404, detail="file not found")
@@ -437,12 +679,12 @@ class BenchmarkResponse(BaseModel):
 
 
 @app.get("/benchmark", response_model=BenchmarkResponse)
-def benchmark_search(
+async def benchmark_search(
     lat1: float = Query(..., description="Person A latitude"),
     lon1: float = Query(..., description="Person A longitude"),
     lat2: float = Query(..., description="Person B latitude"),
     lon2: float = Query(..., description="Person B longitude"),
-    category: str = Query("cafe", description="OSM amenity category"),
+    category: str = Query("cafe", description="OSM amenity category (comma-separated for several)"),
     limit: int = Query(10, ge=1, le=50),
     radius_m: Optional[int] = Query(None, ge=100, le=10000, description="Search radius in meters"),
 ):
@@ -460,7 +702,7 @@ def benchmark_search(
     r_m = radius_m or max(800, min(3000, auto_r))
     
     try:
-        pois = fetch_pois(mid_lat, mid_lon, category, r_m)
+        pois = await fetch_pois(mid_lat, mid_lon, _parse_categories(category), r_m)
     except Exception as e:
         print(f"Overpass error: {e}")
         return {
@@ -485,22 +727,14 @@ def benchmark_search(
         }
     
     # 重複除去
-    deduped: List[dict] = []
-    seen: Dict[str, List[Tuple[float, float]]] = {}
-    for p in pois:
-        key = (p.get("name") or "Unnamed").strip().lower()
-        lst = seen.setdefault(key, [])
-        if any(_haversine_m(p["lat"], p["lon"], la, lo) < 30 for (la, lo) in lst):
-            continue
-        lst.append((p["lat"], p["lon"]))
-        deduped.append(p)
+    deduped = _dedup_pois(pois)
     
     k = min(limit, len(deduped))
     
     # R-tree検索
     start = time_module.perf_counter()
     idx, items = build_rtree(deduped)
-    nearest_ids_rtree = list(idx.nearest((mid_lon, mid_lat, mid_lon, mid_lat), k))
+    nearest_ids_rtree = rtree_nearest_k(idx, items, mid_lat, mid_lon, k)
     rtree_time = (time_module.perf_counter() - start) * 1000  # ms
     
     # 線形探索
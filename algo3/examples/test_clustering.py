@@ -5,10 +5,13 @@ ST-DBSCANのテストスクリプト
 結果を可視化担当者向けにエクスポートする
 """
 
+import io
 import sys
 import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib.animation import FuncAnimation
@@ -46,8 +49,6 @@ def generate_synthetic_rain_clouds(n_clouds: int = 3,
         STPointのリスト
     """
     np.random.seed(42)
-    points = []
-    point_id = 0
     
     # 各雨雲の初期位置と移動方向を設定
     cloud_centers = []
@@ -63,72 +64,94 @@ def generate_synthetic_rain_clouds(n_clouds: int = 3,
             'v_lon': velocity_lon
         })
     
-    # 各タイムステップで雨雲を生成
-    for t in range(time_steps):
-        for cloud_idx, cloud in enumerate(cloud_centers):
-            # 雨雲の中心位置を更新（移動）
-            current_lat = cloud['lat'] + cloud['v_lat'] * t
-            current_lon = cloud['lon'] + cloud['v_lon'] * t
-            
-            # 雨雲内のポイントを生成（正規分布）
-            for _ in range(points_per_cloud):
-                # 雨雲の広がり（標準偏差）
-                spread = 0.1
-                lat = np.random.normal(current_lat, spread)
-                lon = np.random.normal(current_lon, spread)
-                
-                # 降水量（雨雲の中心ほど強い）
-                dist_from_center = np.sqrt((lat - current_lat)**2 + (lon - current_lon)**2)
-                value = max(0, 10 - dist_from_center * 50) + np.random.uniform(0, 2)
-                
-                point = STPoint(
-                    id=point_id,
-                    lat=lat,
-                    lon=lon,
-                    time=float(t),
-                    value=value
-                )
-                points.append(point)
-                point_id += 1
-    
-    # ノイズポイントを追加
-    n_noise = int(len(points) * noise_ratio)
-    for _ in range(n_noise):
-        lat = 35.0 + np.random.uniform(-3, 3)
-        lon = 139.0 + np.random.uniform(-3, 3)
-        time = float(np.random.randint(0, time_steps))
-        value = np.random.uniform(1, 5)
-        
-        point = STPoint(
-            id=point_id,
-            lat=lat,
-            lon=lon,
-            time=time,
-            value=value
-        )
-        points.append(point)
-        point_id += 1
+    centers = np.array([[c['lat'], c['lon']] for c in cloud_centers])       # (n_clouds, 2)
+    velocities = np.array([[c['v_lat'], c['v_lon']] for c in cloud_centers])  # (n_clouds, 2)
+    
+    # 各タイムステップ・各雨雲の中心位置（移動）を一括計算: (time_steps, n_clouds, 2)
+    steps = np.arange(time_steps, dtype=float)
+    current = centers[np.newaxis, :, :] + velocities[np.newaxis, :, :] * steps[:, np.newaxis, np.newaxis]
+    
+    # 雨雲内のポイントを正規分布で一括生成（雨雲の広がり＝標準偏差）
+    spread = 0.1
+    shape = (time_steps, n_clouds, points_per_cloud)
+    lats = np.random.normal(current[:, :, 0:1], spread, size=shape)
+    lons = np.random.normal(current[:, :, 1:2], spread, size=shape)
+    
+    # 降水量（雨雲の中心ほど強い）
+    dist_from_center = np.hypot(lats - current[:, :, 0:1], lons - current[:, :, 1:2])
+    values = np.clip(10 - dist_from_center * 50, 0, None) + np.random.uniform(0, 2, size=shape)
+    times = np.broadcast_to(steps[:, np.newaxis, np.newaxis], shape)
+    
+    # ノイズポイント
+    n_noise = int(lats.size * noise_ratio)
+    noise_lats = 35.0 + np.random.uniform(-3, 3, size=n_noise)
+    noise_lons = 139.0 + np.random.uniform(-3, 3, size=n_noise)
+    noise_times = np.random.randint(0, time_steps, size=n_noise).astype(float)
+    noise_values = np.random.uniform(1, 5, size=n_noise)
+    
+    # 配列をまとめてから STPoint を一括生成（時刻→雨雲→ポイントの順、ノイズは末尾）
+    all_lats = np.concatenate([lats.ravel(), noise_lats])
+    all_lons = np.concatenate([lons.ravel(), noise_lons])
+    all_times = np.concatenate([times.ravel(), noise_times])
+    all_values = np.concatenate([values.ravel(), noise_values])
+    points = [
+        STPoint(id=i, lat=lat, lon=lon, time=time, value=value)
+        for i, (lat, lon, time, value) in enumerate(zip(all_lats.tolist(), all_lons.tolist(),
+                                                        all_times.tolist(), all_values.tolist()))
+    ]
     
     return points
 
 
-def visualize_clusters_2d(points: list, title: str = "ST-DBSCAN Clustering Result"):
+def pack_points(points: list) -> dict:
     """
-    クラスタリング結果を2D空間上に可視化
+    STPointのリストを属性ごとのNumPy配列（列指向）にまとめる
+    
+    可視化ではこの辞書を受け取り、STPointの属性参照を繰り返さずに
+    配列のスライスやマスクで処理する。STPointのリストは STDBSCAN.fit の入力にのみ使う
     
     Parameters
     ----------
     points : list
         STPointのリスト
+        
+    Returns
+    -------
+    dict
+        {'lat', 'lon', 'time', 'cluster', 'value'} をキーとする配列の辞書
+    """
+    n = len(points)
+    return {
+        'lat': np.fromiter((p.lat for p in points), dtype=np.float64, count=n),
+        'lon': np.fromiter((p.lon for p in points), dtype=np.float64, count=n),
+        'time': np.fromiter((p.time for p in points), dtype=np.float64, count=n),
+        'cluster': np.fromiter((p.cluster for p in points), dtype=np.int32, count=n),
+        'value': np.fromiter((p.value for p in points), dtype=np.float64, count=n),
+    }
+
+
+def visualize_clusters_2d(data: dict, title: str = "ST-DBSCAN Clustering Result"):
+    """
+    クラスタリング結果を2D空間上に可視化
+    
+    Parameters
+    ----------
+    data : dict
+        pack_points() で作成した配列の辞書
     title : str
         グラフのタイトル
+        
+    Returns
+    -------
+    matplotlib.figure.Figure
+        作成した図（PNG化は render_figure、書き出しは save_figure で行う）
     """
     fig, axes = plt.subplots(1, 2, figsize=(16, 6))
     
     # 時刻ごとに色分け（左図）
-    times = np.array([p.time for p in points])
-    lats = np.array([p.lat for p in points])
-    lons = np.array([p.lon for p in points])
+    times = data['time']
+    lats = data['lat']
+    lons = data['lon']
     
     scatter1 = axes[0].scatter(lons, lats, c=times, cmap='viridis', 
                               alpha=0.6, s=50)
@@ -139,7 +162,7 @@ def visualize_clusters_2d(points: list, title: str = "ST-DBSCAN Clustering Resul
     plt.colorbar(scatter1, ax=axes[0], label='Time step')
     
     # クラスタIDごとに色分け（右図）
-    clusters = np.array([p.cluster for p in points])
+    clusters = data['cluster']
     scatter2 = axes[1].scatter(lons, lats, c=clusters, cmap='tab20', 
                               alpha=0.6, s=50)
     axes[1].set_xlabel('Longitude')
@@ -149,32 +172,35 @@ def visualize_clusters_2d(points: list, title: str = "ST-DBSCAN Clustering Resul
     plt.colorbar(scatter2, ax=axes[1], label='Cluster ID')
     
     fig.suptitle(title, fontsize=14, fontweight='bold')
-    plt.tight_layout()
-    plt.savefig('../output/clustering_result_2d.png', dpi=150, bbox_inches='tight')
-    print("2D visualization saved as '../output/clustering_result_2d.png'")
-    plt.show()
+    fig.tight_layout()
+    return fig
 
 
-def visualize_clusters_3d(points: list, title: str = "ST-DBSCAN 3D Visualization"):
+def visualize_clusters_3d(data: dict, title: str = "ST-DBSCAN 3D Visualization"):
     """
     クラスタリング結果を3D時空間上に可視化
     
     Parameters
     ----------
-    points : list
-        STPointのリスト
+    data : dict
+        pack_points() で作成した配列の辞書
     title : str
         グラフのタイトル
+        
+    Returns
+    -------
+    matplotlib.figure.Figure
+        作成した図（PNG化は render_figure、書き出しは save_figure で行う）
     """
     from mpl_toolkits.mplot3d import Axes3D
     
     fig = plt.figure(figsize=(12, 9))
     ax = fig.add_subplot(111, projection='3d')
     
-    lons = np.array([p.lon for p in points])
-    lats = np.array([p.lat for p in points])
-    times = np.array([p.time for p in points])
-    clusters = np.array([p.cluster for p in points])
+    lons = data['lon']
+    lats = data['lat']
+    times = data['time']
+    clusters = data['cluster']
     
     # クラスタIDごとに色分け
     scatter = ax.scatter(lons, lats, times, c=clusters, cmap='tab20', 
@@ -186,25 +212,52 @@ def visualize_clusters_3d(points: list, title: str = "ST-DBSCAN 3D Visualization
     ax.set_title(title)
     
     plt.colorbar(scatter, ax=ax, label='Cluster ID', pad=0.1)
-    plt.tight_layout()
-    plt.savefig('../output/clustering_result_3d.png', dpi=150, bbox_inches='tight')
-    print("3D visualization saved as '../output/clustering_result_3d.png'")
-    plt.show()
+    fig.tight_layout()
+    return fig
+
+
+def render_figure(fig) -> bytes:
+    """
+    図をPNGのバイト列に描画して閉じる
+    
+    matplotlib はスレッドセーフではないため、描画はメインスレッドで行う
+    """
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=150, bbox_inches='tight')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def save_figure(png: bytes, path: str):
+    """
+    描画済みのPNGをファイルに書き出す
+    
+    ファイルへの書き込みだけなので、別スレッドから並行に呼び出せる
+    """
+    with open(path, 'wb') as f:
+        f.write(png)
+    print(f"Visualization saved as '{path}'")
 
 
-def visualize_animation(points: list, output_file: str = 'rain_animation.gif'):
+def visualize_animation(data: dict, output_file: str = 'rain_animation.gif'):
     """
     時間経過に伴う雨雲の動きをアニメーション化
     
     Parameters
     ----------
-    points : list
-        STPointのリスト
+    data : dict
+        pack_points() で作成した配列の辞書
     output_file : str
         出力ファイル名
     """
-    # 時刻でソート
-    unique_times = sorted(set([p.time for p in points]))
+    # 時刻でソートし、各フレーム（時刻）に属するポイントのインデックスを事前に一括計算
+    order = np.argsort(data['time'], kind='stable')
+    unique_times, starts = np.unique(data['time'][order], return_index=True)
+    frame_indices = np.split(order, starts[1:])
+    
+    # 軸の範囲（全フレーム共通）
+    xlim = (data['lon'].min() - 0.2, data['lon'].max() + 0.2)
+    ylim = (data['lat'].min() - 0.2, data['lat'].max() + 0.2)
     
     fig, ax = plt.subplots(figsize=(10, 8))
     
@@ -212,18 +265,13 @@ def visualize_animation(points: list, output_file: str = 'rain_animation.gif'):
         ax.clear()
         current_time = unique_times[frame]
         
-        # 現在の時刻のポイントを抽出
-        current_points = [p for p in points if p.time == current_time]
+        # 現在の時刻のポイントを抽出（全件を走査せず、事前計算したインデックスで取り出す）
+        idx = frame_indices[frame]
         
-        if current_points:
-            lons = [p.lon for p in current_points]
-            lats = [p.lat for p in current_points]
-            clusters = [p.cluster for p in current_points]
-            values = [p.value for p in current_points]
-            
+        if len(idx):
             # クラスタIDで色分け、降水量でサイズを変更
-            scatter = ax.scatter(lons, lats, c=clusters, cmap='tab20',
-                               s=[v*10 for v in values], alpha=0.6)
+            scatter = ax.scatter(data['lon'][idx], data['lat'][idx], c=data['cluster'][idx],
+                               cmap='tab20', s=data['value'][idx] * 10, alpha=0.6)
             
             ax.set_xlabel('Longitude')
             ax.set_ylabel('Latitude')
@@ -231,10 +279,8 @@ def visualize_animation(points: list, output_file: str = 'rain_animation.gif'):
             ax.grid(True, alpha=0.3)
             
             # 軸の範囲を固定
-            all_lons = [p.lon for p in points]
-            all_lats = [p.lat for p in points]
-            ax.set_xlim(min(all_lons) - 0.2, max(all_lons) + 0.2)
-            ax.set_ylim(min(all_lats) - 0.2, max(all_lats) + 0.2)
+            ax.set_xlim(*xlim)
+            ax.set_ylim(*ylim)
     
     anim = FuncAnimation(fig, update, frames=len(unique_times),
                         interval=500, repeat=True)
@@ -292,20 +338,31 @@ def main():
     
     # 4. 可視化
     print("\n[4] Creating visualizations...")
-    visualize_clusters_2d(points)
-    visualize_clusters_3d(points)
-    
-    # アニメーション（オプション）
-    try:
-        print("\n[5] Creating animation...")
-        visualize_animation(points)
-    except Exception as e:
-        print(f"Animation creation failed: {e}")
+    # クラスタ確定後に一度だけ列指向の配列にまとめる
+    data = pack_points(points)
+    png_2d = render_figure(visualize_clusters_2d(data))
+    png_3d = render_figure(visualize_clusters_3d(data))
+    exporter = ClusteringResultExporter(stdbscan)
     
-    # 5. データのエクスポート（可視化担当者向け）
+    # 図の書き出しと 5. データのエクスポート（可視化担当者向け）はディスクI/O中心なので並行に実行
+    # matplotlib の描画（PNG化・アニメーション）はメインスレッドでしか行わない
+    print("\n[5] Creating animation...")
     print("\n[6] Exporting data for visualization team...")
-    exporter = ClusteringResultExporter(stdbscan)
-    exporter.export_for_visualization(output_dir='../output/visualization_data')
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = [
+            executor.submit(save_figure, png_2d, '../output/clustering_result_2d.png'),
+            executor.submit(save_figure, png_3d, '../output/clustering_result_3d.png'),
+            executor.submit(exporter.export_for_visualization, output_dir='../output/visualization_data'),
+        ]
+        
+        # アニメーション（オプション）はその間にメインスレッドで作成
+        try:
+            visualize_animation(data)
+        except Exception as e:
+            print(f"Animation creation failed: {e}")
+        
+        for future in futures:
+            future.result()
     
     # DataFrameのサンプルを表示
     print("\n[7] Data Preview (first 10 rows):")
@@ -6,72 +6,141 @@
 
 import sys
 import os
+from pathlib import Path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
+from matplotlib.colors import Normalize
 from matplotlib.animation import FuncAnimation
+from matplotlib.collections import LineCollection
 import json
+from functools import cached_property
 from font_config import setup_japanese_font
 
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads  # orjson が無い場合は標準の json を使う
+
+try:
+    from scipy.spatial import ConvexHull
+except ImportError:
+    ConvexHull = None  # scipy が無い場合はクラスタの輪郭を描かない
+
 # 日本語フォントを設定
 setup_japanese_font()
 
+# 出力先ディレクトリ（呼び出しごとにパスを組み立てないよう一度だけ解決する）
+OUT_DIR = Path(__file__).resolve().parent.parent / 'output'
+
+# クラスタIDの配色（呼び出しごとに正規化し直さないよう固定のカラーマップと範囲を使う）
+CLUSTER_CMAP = plt.get_cmap('tab20')
+CLUSTER_NORM = Normalize(vmin=1, vmax=CLUSTER_CMAP.N)
+
+# clustering_result.csv の列の型（描画で繰り返し走査する数値列は32bit、時刻は秒なので64bit）
+CSV_DTYPES = {'lat': 'float32', 'lon': 'float32', 'value': 'float32',
+              'cluster': 'int32', 'time': 'float64'}
+
+
+class VisualizationData:
+    """
+    エクスポートされたクラスタリング結果
+
+    CSV（DataFrame）は生成時に読み込み、JSONファイルは初めて参照されたときに読み込む。
+    ``df, colors, bounds, time_data = load_data(...)`` のようにアンパックすることもできる。
 
-def load_data(data_dir='../output/visualization_data'):
+    Parameters
+    ----------
+    data_dir : str
+        データディレクトリのパス
+    """
+    
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        
+        # CSVファイルから全データを読み込み（型を指定して推論を省き、数値列は32bitで保持）
+        csv_path = f'{data_dir}/clustering_result.csv'
+        try:
+            self.df = pd.read_csv(csv_path, engine='pyarrow', dtype=CSV_DTYPES)
+        except ImportError:
+            # pyarrow が無い場合は C エンジンで同じ型指定のまま読み込む
+            self.df = pd.read_csv(csv_path, engine='c', dtype=CSV_DTYPES)
+    
+    def _load_json(self, filename):
+        with open(f'{self.data_dir}/{filename}', 'rb') as f:
+            return _json_loads(f.read())
+    
+    @cached_property
+    def colors(self):
+        """クラスタの色情報"""
+        return self._load_json('cluster_colors.json')
+    
+    @cached_property
+    def bounds(self):
+        """クラスタの境界情報"""
+        return self._load_json('cluster_bounds.json')
+    
+    @cached_property
+    def time_data(self):
+        """時刻ごとのデータ"""
+        return self._load_json('clusters_by_time.json')
+    
+    def __iter__(self):
+        return iter((self.df, self.colors, self.bounds, self.time_data))
+
+
+def load_data(data_dir=OUT_DIR / 'visualization_data'):
     """
     エクスポートされたデータを読み込む
     
     Parameters
     ----------
-    data_dir : str
+    data_dir : str or Path
         データディレクトリのパス
         
     Returns
     -------
-    tuple
-        (df, colors, bounds, time_data)
+    VisualizationData
+        ``df`` 属性にDataFrame、``colors`` / ``bounds`` / ``time_data`` は参照時に読み込む
     """
-    # CSVファイルから全データを読み込み
-    df = pd.read_csv(f'{data_dir}/clustering_result.csv')
-    
-    # クラスタの色情報を読み込み
-    with open(f'{data_dir}/cluster_colors.json', 'r') as f:
-        colors = json.load(f)
-    
-    # クラスタの境界情報を読み込み
-    with open(f'{data_dir}/cluster_bounds.json', 'r') as f:
-        bounds = json.load(f)
-    
-    # 時刻ごとのデータを読み込み
-    with open(f'{data_dir}/clusters_by_time.json', 'r') as f:
-        time_data = json.load(f)
-    
-    return df, colors, bounds, time_data
+    return VisualizationData(data_dir)
 
 
-def visualize_single_timestep(df, time_step, output_file=None):
+def visualize_single_timestep(df, time_step, output_file=None, ax=None):
     """
     特定の時刻のクラスタを可視化
     
     Parameters
     ----------
     df : pd.DataFrame
-        クラスタリング結果のDataFrame
+        クラスタリング結果のDataFrame（time でソートしたインデックス付き）
     time_step : float
         表示する時刻
     output_file : str, optional
         保存先ファイル名
+    ax : matplotlib.axes.Axes, optional
+        描画先のAxes。指定した場合はクリアして再利用し、図は閉じない
     """
-    # 指定時刻のデータを抽出
-    time_data = df[df['time'] == time_step]
+    # 指定時刻のデータを抽出（ソート済みインデックスのスライスなので全件比較しない）
+    time_data = df.loc[time_step:time_step]
     
     if len(time_data) == 0:
         print(f"No data for time {time_step}")
         return
     
-    fig, ax = plt.subplots(figsize=(12, 10))
+    # 図の作成（Axesが渡された場合はクリアして使い回す）
+    owns_figure = ax is None
+    if owns_figure:
+        fig, ax = plt.subplots(figsize=(12, 10))
+    else:
+        fig = ax.figure
+        ax.cla()
+    # 前回のカラーバー用Axesがあれば再利用する
+    cbar_axes = [other for other in fig.axes if other is not ax]
+    cax = cbar_axes[0] if cbar_axes else None
     
     # ノイズを描画（灰色）
     noise = time_data[time_data['cluster'] == 0]
@@ -83,23 +152,25 @@ def visualize_single_timestep(df, time_step, output_file=None):
     clusters = time_data[time_data['cluster'] > 0]
     if len(clusters) > 0:
         # 降水量でサイズを変更、クラスタIDで色分け
-        scatter = ax.scatter(clusters['lon'], clusters['lat'],
-                           c=clusters['cluster'], cmap='tab20',
-                           s=clusters['value'] * 15,  # 降水量に応じてサイズ変更
+        cluster_idx = clusters['cluster'].to_numpy()
+        sizes = (clusters['value'].to_numpy() * 15).astype(np.float32)  # 降水量に応じてサイズ変更
+        scatter = ax.scatter(clusters['lon'].to_numpy(), clusters['lat'].to_numpy(),
+                           c=cluster_idx, cmap=CLUSTER_CMAP, norm=CLUSTER_NORM,
+                           s=sizes, rasterized=True,  # 点が多いのでベクタ出力でも画像として描く
                            alpha=0.7, edgecolors='black', linewidth=0.5)
         
-        plt.colorbar(scatter, ax=ax, label='Cluster ID')
+        fig.colorbar(scatter, ax=ax, cax=cax, label='Cluster ID')
         
-        # 各クラスタの中心に番号を表示
-        for cluster_id in clusters['cluster'].unique():
-            cluster_points = clusters[clusters['cluster'] == cluster_id]
-            center_lon = cluster_points['lon'].mean()
-            center_lat = cluster_points['lat'].mean()
+        # 各クラスタの中心に番号を表示（中心は groupby で一括計算）
+        centers = clusters.groupby('cluster', sort=False)[['lon', 'lat']].mean()
+        for cluster_id, (center_lon, center_lat) in centers.iterrows():
             ax.text(center_lon, center_lat, f'{int(cluster_id)}',
                    fontsize=12, fontweight='bold',
                    ha='center', va='center',
                    bbox=dict(boxstyle='round,pad=0.3', 
                            facecolor='white', alpha=0.7))
+    elif cax is not None:
+        cax.cla()
     
     ax.set_xlabel('Longitude (経度)', fontsize=12)
     ax.set_ylabel('Latitude (緯度)', fontsize=12)
@@ -107,13 +178,16 @@ def visualize_single_timestep(df, time_step, output_file=None):
     ax.grid(True, alpha=0.3)
     ax.legend()
     
-    plt.tight_layout()
+    fig.tight_layout()
     
     if output_file:
-        plt.savefig('../output/' + output_file, dpi=150, bbox_inches='tight')
-        print(f"Saved: ../output/{output_file}")
+        output_path = OUT_DIR / output_file
+        fig.savefig(output_path, dpi=150, bbox_inches='tight')
+        print(f"Saved: {output_path}")
     
     plt.show()
+    if owns_figure:
+        plt.close(fig)
 
 
 def create_rain_radar_animation(df, output_file='rain_radar.gif'):
@@ -123,11 +197,29 @@ def create_rain_radar_animation(df, output_file='rain_radar.gif'):
     Parameters
     ----------
     df : pd.DataFrame
-        クラスタリング結果のDataFrame
+        クラスタリング結果のDataFrame（time でソートしたインデックス付き）
     output_file : str
         出力ファイル名
     """
-    unique_times = sorted(df['time'].unique())
+    unique_times = df.index.unique()
+    
+    # 時刻ごとのノイズ／クラスタを事前に一度だけ分割（フレームごとに全件をフィルタしない）
+    empty = df.iloc[:0]
+    noise_by_time = dict(tuple(df[df['cluster'] == 0].groupby(level='time', sort=False)))
+    cluster_by_time = dict(tuple(df[df['cluster'] > 0].groupby(level='time', sort=False)))
+    
+    # 各クラスタの輪郭（凸包の辺）を (時刻, クラスタID) ごとに事前計算し、時刻ごとにまとめる
+    hull_segments_by_time = {}
+    if ConvexHull is not None:
+        for (t, cluster_id), cluster_points in df[df['cluster'] > 0].groupby([pd.Grouper(level='time'), 'cluster'], sort=False):
+            if len(cluster_points) > 2:
+                try:
+                    points = cluster_points[['lon', 'lat']].to_numpy()
+                    hull = ConvexHull(points)
+                    hull_segments_by_time.setdefault(t, []).append(points[hull.simplices])
+                except Exception:
+                    pass
+        hull_segments_by_time = {t: np.concatenate(segs) for t, segs in hull_segments_by_time.items()}
     
     # 全体の範囲を計算
     lon_min, lon_max = df['lon'].min() - 0.2, df['lon'].max() + 0.2
@@ -135,60 +227,57 @@ def create_rain_radar_animation(df, output_file='rain_radar.gif'):
     
     fig, ax = plt.subplots(figsize=(12, 10))
     
+    # 軸まわりは一度だけ設定する
+    ax.set_xlim(lon_min, lon_max)
+    ax.set_ylim(lat_min, lat_max)
+    ax.set_xlabel('Longitude (経度)', fontsize=12)
+    ax.set_ylabel('Latitude (緯度)', fontsize=12)
+    ax.grid(True, alpha=0.3)
+    
+    # 各フレームで使い回すアーティスト（update ではデータだけを差し替える）
+    noise_scatter = ax.scatter([], [], c='lightgray', s=10, alpha=0.3, marker='.')
+    cluster_scatter = ax.scatter([], [], c=[], cmap='jet', s=[],
+                                 alpha=0.7, edgecolors='black', linewidth=0.5)
+    hull_lines = LineCollection([], colors='k', alpha=0.3, linewidths=1)
+    ax.add_collection(hull_lines)
+    title_text = ax.set_title('', fontsize=14, fontweight='bold')
+    time_text = ax.text(0.02, 0.98, '', transform=ax.transAxes, fontsize=14,
+                        verticalalignment='top',
+                        bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+    
     def update(frame):
-        ax.clear()
         current_time = unique_times[frame]
-        time_data = df[df['time'] == current_time]
         
         # ノイズ
-        noise = time_data[time_data['cluster'] == 0]
-        if len(noise) > 0:
-            ax.scatter(noise['lon'], noise['lat'],
-                      c='lightgray', s=10, alpha=0.3, marker='.')
+        noise = noise_by_time.get(current_time, empty)
+        noise_scatter.set_offsets(noise[['lon', 'lat']].to_numpy())
         
-        # クラスタ
-        clusters = time_data[time_data['cluster'] > 0]
+        # クラスタ（色はフレーム内のクラスタIDの範囲で正規化）
+        clusters = cluster_by_time.get(current_time, empty)
+        cluster_scatter.set_offsets(clusters[['lon', 'lat']].to_numpy())
+        cluster_scatter.set_array(clusters['cluster'].to_numpy())
+        cluster_scatter.set_sizes(clusters['value'].to_numpy() * 20)
         if len(clusters) > 0:
-            scatter = ax.scatter(clusters['lon'], clusters['lat'],
-                               c=clusters['cluster'], cmap='jet',
-                               s=clusters['value'] * 20,
-                               alpha=0.7, edgecolors='black', linewidth=0.5)
-            
-            # 各クラスタの輪郭を強調
-            for cluster_id in clusters['cluster'].unique():
-                cluster_points = clusters[clusters['cluster'] == cluster_id]
-                if len(cluster_points) > 2:
-                    # 凸包で囲む（簡易的）
-                    from scipy.spatial import ConvexHull
-                    try:
-                        points = cluster_points[['lon', 'lat']].values
-                        hull = ConvexHull(points)
-                        for simplex in hull.simplices:
-                            ax.plot(points[simplex, 0], points[simplex, 1], 
-                                   'k-', alpha=0.3, linewidth=1)
-                    except:
-                        pass
+            cluster_scatter.autoscale()
         
-        ax.set_xlim(lon_min, lon_max)
-        ax.set_ylim(lat_min, lat_max)
-        ax.set_xlabel('Longitude (経度)', fontsize=12)
-        ax.set_ylabel('Latitude (緯度)', fontsize=12)
-        ax.set_title(f'雨雲レーダー | Time: {current_time:.1f} | Frame: {frame+1}/{len(unique_times)}',
-                    fontsize=14, fontweight='bold')
-        ax.grid(True, alpha=0.3)
+        # 各クラスタの輪郭を強調（事前計算した凸包の辺を差し替えるだけ）
+        hull_lines.set_segments(hull_segments_by_time.get(current_time, []))
+        
+        title_text.set_text(f'雨雲レーダー | Time: {current_time:.1f} | Frame: {frame+1}/{len(unique_times)}')
         
         # タイムスタンプを表示
-        ax.text(0.02, 0.98, f'Time: {current_time:.1f}',
-               transform=ax.transAxes, fontsize=14,
-               verticalalignment='top',
-               bbox=dict(boxstyle='round', facecolor='white', alpha=0.8))
+        time_text.set_text(f'Time: {current_time:.1f}')
+        
+        return noise_scatter, cluster_scatter, hull_lines, title_text, time_text
     
     anim = FuncAnimation(fig, update, frames=len(unique_times),
-                        interval=500, repeat=True)
+                        interval=500, repeat=True, blit=True)
     
     try:
-        anim.save('../output/' + output_file, writer='pillow', fps=2)
-        print(f"Animation saved: ../output/{output_file}")
+        output_path = OUT_DIR / output_file
+        # GIFのフレームは低い解像度で十分（エンコード時間とメモリは dpi² に比例）
+        anim.save(output_path, writer='pillow', fps=2, dpi=80)
+        print(f"Animation saved: {output_path}")
     except Exception as e:
         print(f"Could not save animation: {e}")
         plt.show()
@@ -201,7 +290,7 @@ def display_cluster_statistics(df):
     Parameters
     ----------
     df : pd.DataFrame
-        クラスタリング結果のDataFrame
+        クラスタリング結果のDataFrame（time でソートしたインデックス付き）
     """
     print("=" * 60)
     print("クラスタ統計情報")
@@ -214,8 +303,7 @@ def display_cluster_statistics(df):
     
     # 時刻ごとの統計
     print("\n時刻ごとのクラスタ数:")
-    for time in sorted(df['time'].unique()):
-        time_data = df[df['time'] == time]
+    for time, time_data in df.groupby(level='time'):
         n_clusters = time_data[time_data['cluster'] > 0]['cluster'].nunique()
         n_points = len(time_data[time_data['cluster'] > 0])
         print(f"  Time {time}: {n_clusters} clusters, {n_points} points")
@@ -246,10 +334,15 @@ def main():
     # データの読み込み
     print("\n[1] Loading data...")
     try:
-        df, colors, bounds, time_data = load_data('../output/visualization_data')
+        # 可視化に使うのは DataFrame だけなので、JSONファイルは読み込まない
+        df = load_data(OUT_DIR / 'visualization_data').df
         print(f"Loaded {len(df)} points")
+        # 描画に使う列だけに絞り、マスク抽出のたびに不要な列をコピーしない
+        df = df[['time', 'cluster', 'lon', 'lat', 'value']]
+        # 時刻でソートしたインデックスを一度だけ作り、各時刻の抽出をインデックス参照で行う
+        df = df.sort_values('time', kind='stable').set_index('time', drop=False)
     except FileNotFoundError:
-        print("Error: ../output/visualization_data directory not found!")
+        print(f"Error: {OUT_DIR / 'visualization_data'} directory not found!")
         print("Please run test_clustering.py first to generate the data.")
         return
     
@@ -258,13 +351,16 @@ def main():
     display_cluster_statistics(df)
     
     # 特定時刻の可視化
+    # 2つの時刻で同じ図を使い回す
+    fig, ax = plt.subplots(figsize=(12, 10))
     print("\n[3] Visualizing time step 0...")
     visualize_single_timestep(df, time_step=0, 
-                             output_file='visualization_timestep_0.png')
+                             output_file='visualization_timestep_0.png', ax=ax)
     
     print("\n[4] Visualizing time step 5...")
     visualize_single_timestep(df, time_step=5, 
-                             output_file='visualization_timestep_5.png')
+                             output_file='visualization_timestep_5.png', ax=ax)
+    plt.close(fig)
     
     # アニメーション作成
     print("\n[5] Creating rain radar animation...")
@@ -277,9 +373,9 @@ def main():
     print("可視化完了！")
     print("=" * 60)
     print("\n作成されたファイル:")
-    print("  - ../output/visualization_timestep_0.png")
-    print("  - ../output/visualization_timestep_5.png")
-    print("  - ../output/rain_radar_visualization.gif")
+    print(f"  - {OUT_DIR / 'visualization_timestep_0.png'}")
+    print(f"  - {OUT_DIR / 'visualization_timestep_5.png'}")
+    print(f"  - {OUT_DIR / 'rain_radar_visualization.gif'}")
 
 
 if __name__ == "__main__":
@@ -22,7 +22,10 @@ from weather_data import fetch_tokyo_data
 from export_utils import ClusteringResultExporter
 import matplotlib.pyplot as plt
 import matplotlib.patches as mpatches
-from matplotlib.animation import FuncAnimation, PillowWriter
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
 import pandas as pd
 import numpy as np
 
@@ -34,42 +37,67 @@ except:
     print("⚠️  日本語フォントの設定をスキップします")
 
 
+# 降水量に応じた色とサイズ（青→緑→黄→赤）。境界は 1.0 / 2.0 / 5.0 mm/h
+RAIN_BINS = np.array([1.0, 2.0, 5.0])
+RAIN_COLORS = np.array(['#4a90e2', '#50c878', '#f5d100', '#ff4444'])
+RAIN_SIZES = np.array([50, 80, 120, 150])
+
+
+def rain_style(values):
+    """降水量の配列から、各ポイントの色とサイズを一括で求める"""
+    idx = np.digitize(np.asarray(values), RAIN_BINS)
+    return RAIN_COLORS[idx], RAIN_SIZES[idx]
+
+
 def filter_data_for_visualization(weather_points, num_hours=6, min_value=0.5):
     """可視化用にデータをフィルタリング"""
-    sorted_points = sorted(weather_points, key=lambda p: p.time)
-    unique_times = sorted(list(set(p.time for p in sorted_points)))
-    target_times = set(unique_times[:num_hours])
+    n = len(weather_points)
+    times_arr = np.fromiter((p.time for p in weather_points), dtype=np.float64, count=n)
+    vals_arr = np.fromiter((p.value for p in weather_points), dtype=np.float64, count=n)
     
-    filtered = [p for p in sorted_points 
-                if p.time in target_times and p.value >= min_value]
+    # 時刻の重複除去・ソートと、各ポイントの時刻番号を一度に求める
+    unique_times, inv = np.unique(times_arr, return_inverse=True)
+    target_mask = (inv < num_hours) & (vals_arr >= min_value)
     
-    return filtered, list(target_times)
+    # 対象ポイントだけを時刻順（同時刻内は元の順序）に並べる
+    idx = np.nonzero(target_mask)[0]
+    idx = idx[np.argsort(times_arr[idx], kind='stable')]
+    filtered = [weather_points[i] for i in idx]
+    
+    return filtered, unique_times[:num_hours].tolist()
 
 
-def create_rain_radar_plot(df, time_value, output_path, title_suffix=""):
+def create_rain_radar_plot(df, time_value, output_path, title_suffix="", ax=None):
     """
     特定時刻の雨雲レーダー風プロットを作成
     
     Parameters
     ----------
     df : pd.DataFrame
-        クラスタリング結果のDataFrame
+        クラスタリング結果のDataFrame（time でソートしたインデックス付き）
     time_value : float
         表示する時刻
     output_path : str
         保存先のパス
     title_suffix : str
         タイトルに追加する文字列
+    ax : matplotlib.axes.Axes, optional
+        描画先のAxes。指定した場合はクリアして再利用し、図は閉じない
     """
-    # 特定時刻のデータを抽出
-    time_data = df[df['time'] == time_value].copy()
+    # 特定時刻のデータを抽出（ソート済みインデックスのスライスなので全件比較しない）
+    time_data = df.loc[time_value:time_value]
     
     if len(time_data) == 0:
         print(f"  ⚠️  時刻 {time_value} のデータがありません")
         return
     
-    # 図の作成
-    fig, ax = plt.subplots(figsize=(14, 10))
+    # 図の作成（Axesが渡された場合はクリアして使い回す）
+    owns_figure = ax is None
+    if owns_figure:
+        fig, ax = plt.subplots(figsize=(14, 10))
+    else:
+        fig = ax.figure
+        ax.cla()
     
     # 背景色を設定（レーダー風）
     ax.set_facecolor('#1a1a2e')
@@ -87,49 +115,19 @@ def create_rain_radar_plot(df, time_value, output_path, title_suffix=""):
     
     # クラスタをプロット
     if len(clusters) > 0:
-        # クラスタIDでカラーマップ
-        cluster_ids = clusters['cluster'].unique()
-        n_clusters = len(cluster_ids)
-        
         # 雨雲レーダー風の色設定
         # 降水量に応じた色: 弱い雨(青) → 強い雨(赤)
-        colors = []
-        sizes = []
-        
-        for _, row in clusters.iterrows():
-            value = row['value']
-            cluster_id = row['cluster']
-            
-            # 降水量に応じた色（青→緑→黄→赤）
-            if value < 1.0:
-                color = '#4a90e2'  # 青（弱い雨）
-                size = 50
-            elif value < 2.0:
-                color = '#50c878'  # 緑（中程度）
-                size = 80
-            elif value < 5.0:
-                color = '#f5d100'  # 黄（やや強い雨）
-                size = 120
-            else:
-                color = '#ff4444'  # 赤（強い雨）
-                size = 150
-            
-            colors.append(color)
-            sizes.append(size)
+        colors, sizes = rain_style(clusters['value'].to_numpy())
         
         # プロット
         scatter = ax.scatter(clusters['lon'], clusters['lat'],
                            c=colors, s=sizes, alpha=0.7,
-                           edgecolors='white', linewidths=0.5)
+                           edgecolors='white', linewidths=0.5,
+                           rasterized=True)  # 点が多いのでベクタ出力でも画像として描く
         
-        # クラスタごとに境界線を描画
-        for cluster_id in cluster_ids:
-            cluster_data = clusters[clusters['cluster'] == cluster_id]
-            
-            # クラスタの中心を計算
-            center_lon = cluster_data['lon'].mean()
-            center_lat = cluster_data['lat'].mean()
-            
+        # クラスタの中心を一括計算
+        centers = clusters.groupby('cluster', sort=False)[['lon', 'lat']].mean()
+        for cluster_id, (center_lon, center_lat) in centers.iterrows():
             # クラスタ番号を表示
             ax.text(center_lon, center_lat, f'#{int(cluster_id)}',
                    color='white', fontsize=12, fontweight='bold',
@@ -184,136 +182,177 @@ def create_rain_radar_plot(df, time_value, output_path, title_suffix=""):
     ax.spines['right'].set_color('white')
     
     # 統計情報を表示
-    n_clusters = len(clusters['cluster'].unique()) if len(clusters) > 0 else 0
+    n_clusters = clusters['cluster'].nunique()
     stats_text = f'クラスタ数: {n_clusters}\n降水ポイント数: {len(time_data)}'
     ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
            color='white', fontsize=10, verticalalignment='top',
            bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
     
-    plt.tight_layout()
-    plt.savefig(output_path, dpi=150, facecolor='#0f0f1e', edgecolor='none')
-    plt.close()
+    fig.tight_layout()
+    fig.savefig(output_path, dpi=150, facecolor='#0f0f1e', edgecolor='none')
+    if owns_figure:
+        plt.close(fig)
     
     print(f"  ✓ 保存: {output_path}")
 
 
-def create_rain_animation(df, unique_times, output_path):
+# ワーカープロセスごとに一度だけ作る図と、フレームごとに差し替えるアーティスト
+_frame_artists = None
+
+
+def _init_rain_frame_worker(xlim, ylim):
+    """アニメーション描画用ワーカーの初期化（図と再利用するアーティストを作成）"""
+    global _frame_artists
+    
+    # GIFのフレームは静止画より低い解像度で十分（エンコード時間とメモリは dpi² に比例）
+    fig = Figure(figsize=(14, 10), dpi=80)
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    
+    # 背景色
+    ax.set_facecolor('#1a1a2e')
+    fig.patch.set_facecolor('#0f0f1e')
+    
+    # 軸の範囲を固定
+    ax.set_xlim(*xlim)
+    ax.set_ylim(*ylim)
+    
+    # 軸まわり（ラベル・グリッド・枠線）は一度だけ設定する
+    ax.set_xlabel('経度 (°E)', color='white', fontsize=12)
+    ax.set_ylabel('緯度 (°N)', color='white', fontsize=12)
+    ax.grid(True, alpha=0.2, color='white', linestyle='--')
+    ax.tick_params(colors='white')
+    
+    for spine in ax.spines.values():
+        spine.set_color('white')
+    
+    # 各フレームで使い回すアーティスト（描画時はデータだけを差し替える）
+    noise_scatter = ax.scatter([], [], c='#666666', s=10, alpha=0.2, marker='.')
+    cluster_scatter = ax.scatter([], [], s=[], alpha=0.7,
+                                 edgecolors='white', linewidths=0.5)
+    title_text = ax.set_title('', color='white', fontsize=16, fontweight='bold', pad=20)
+    stats_text = ax.text(0.02, 0.98, '', transform=ax.transAxes,
+                         color='white', fontsize=10, verticalalignment='top',
+                         bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
+    label_texts = []  # クラスタID表示（必要な数だけ作成して再利用）
+    
+    _frame_artists = (fig, ax, noise_scatter, cluster_scatter, title_text, stats_text, label_texts)
+
+
+def _render_rain_frame(payload):
+    """
+    1フレームを描画してRGBA画像のバイト列を返す（ワーカープロセスで実行）
+    
+    Parameters
+    ----------
+    payload : tuple
+        (ノイズ座標, クラスタ座標, 降水量, [(クラスタID, 中心経度, 中心緯度)], タイトル, 統計情報)
+    
+    Returns
+    -------
+    tuple
+        ((幅, 高さ), RGBAバイト列)
+    """
+    noise_xy, cluster_xy, values, centers, title, stats = payload
+    fig, ax, noise_scatter, cluster_scatter, title_text, stats_text, label_texts = _frame_artists
+    
+    # ノイズをプロット
+    noise_scatter.set_offsets(noise_xy)
+    
+    # クラスタをプロット
+    colors, sizes = rain_style(values)
+    cluster_scatter.set_offsets(cluster_xy)
+    cluster_scatter.set_facecolors(colors)
+    cluster_scatter.set_sizes(sizes)
+    
+    # クラスタIDを表示
+    while len(label_texts) < len(centers):
+        label_texts.append(ax.text(0, 0, '', color='white', fontsize=10, fontweight='bold',
+                                   ha='center', va='center',
+                                   bbox=dict(boxstyle='round,pad=0.3',
+                                             facecolor='black', alpha=0.7)))
+    for text, (cluster_id, center_lon, center_lat) in zip(label_texts, centers):
+        text.set_position((center_lon, center_lat))
+        text.set_text(f'#{cluster_id}')
+        text.set_visible(True)
+    for text in label_texts[len(centers):]:
+        text.set_visible(False)
+    
+    # タイトルと統計情報
+    title_text.set_text(title)
+    stats_text.set_text(stats)
+    
+    fig.canvas.draw()
+    return fig.canvas.get_width_height(), bytes(fig.canvas.buffer_rgba())
+
+
+def create_rain_animation(df, unique_times, output_path, max_workers=None):
     """
     雨雲の時間変化アニメーションを作成
     
+    各フレームは独立しているので、複数プロセスで並列に描画してから
+    順番どおりにGIFへまとめる
+    
     Parameters
     ----------
     df : pd.DataFrame
-        クラスタリング結果のDataFrame
+        クラスタリング結果のDataFrame（time でソートしたインデックス付き）
     unique_times : List[float]
         時刻のリスト
     output_path : str
         保存先のパス
+    max_workers : int, optional
+        描画に使うプロセス数（省略時はCPU数とフレーム数の小さい方）
     """
     print("\n  アニメーション作成中...")
     
-    fig, ax = plt.subplots(figsize=(14, 10))
-    
-    # 背景色
-    ax.set_facecolor('#1a1a2e')
-    fig.patch.set_facecolor('#0f0f1e')
+    n_frames = len(unique_times)
+    if n_frames == 0:
+        print("  ⚠️  アニメーションにする時刻がありません")
+        return
     
     # 軸の範囲を固定
     all_lats = df['lat']
     all_lons = df['lon']
     lat_margin = (all_lats.max() - all_lats.min()) * 0.1
     lon_margin = (all_lons.max() - all_lons.min()) * 0.1
-    
-    ax.set_xlim(all_lons.min() - lon_margin, all_lons.max() + lon_margin)
-    ax.set_ylim(all_lats.min() - lat_margin, all_lats.max() + lat_margin)
-    
-    def update(frame):
-        ax.clear()
-        ax.set_facecolor('#1a1a2e')
-        
-        time_value = unique_times[frame]
-        time_data = df[df['time'] == time_value]
-        
-        if len(time_data) == 0:
-            return
-        
-        # ノイズとクラスタを分離
-        noise = time_data[time_data['cluster'] == 0]
-        clusters = time_data[time_data['cluster'] > 0]
-        
-        # ノイズをプロット
-        if len(noise) > 0:
-            ax.scatter(noise['lon'], noise['lat'], 
-                      c='#666666', s=10, alpha=0.2, marker='.')
+    xlim = (all_lons.min() - lon_margin, all_lons.max() + lon_margin)
+    ylim = (all_lats.min() - lat_margin, all_lats.max() + lat_margin)
+    
+    # 時刻ごとにノイズとクラスタを事前に一度だけ分離（フレームごとに全件をフィルタしない）
+    empty = df.iloc[:0]
+    noise_by_time = dict(tuple(df[df['cluster'] == 0].groupby(level='time', sort=False)))
+    cluster_by_time = dict(tuple(df[df['cluster'] > 0].groupby(level='time', sort=False)))
+    
+    # ワーカーに渡すのは各フレームの描画に必要な配列と文字列だけにする
+    payloads = []
+    for frame, time_value in enumerate(unique_times):
+        noise = noise_by_time.get(time_value, empty)
+        clusters = cluster_by_time.get(time_value, empty)
         
-        # クラスタをプロット
-        if len(clusters) > 0:
-            colors = []
-            sizes = []
-            
-            for _, row in clusters.iterrows():
-                value = row['value']
-                
-                if value < 1.0:
-                    color = '#4a90e2'
-                    size = 50
-                elif value < 2.0:
-                    color = '#50c878'
-                    size = 80
-                elif value < 5.0:
-                    color = '#f5d100'
-                    size = 120
-                else:
-                    color = '#ff4444'
-                    size = 150
-                
-                colors.append(color)
-                sizes.append(size)
-            
-            ax.scatter(clusters['lon'], clusters['lat'],
-                      c=colors, s=sizes, alpha=0.7,
-                      edgecolors='white', linewidths=0.5)
-            
-            # クラスタIDを表示
-            for cluster_id in clusters['cluster'].unique():
-                cluster_data = clusters[clusters['cluster'] == cluster_id]
-                center_lon = cluster_data['lon'].mean()
-                center_lat = cluster_data['lat'].mean()
-                
-                ax.text(center_lon, center_lat, f'#{int(cluster_id)}',
-                       color='white', fontsize=10, fontweight='bold',
-                       ha='center', va='center',
-                       bbox=dict(boxstyle='round,pad=0.3', 
-                               facecolor='black', alpha=0.7))
+        # クラスタの中心は groupby で一括計算
+        centers = clusters.groupby('cluster', sort=False)[['lon', 'lat']].mean()
+        time_str = datetime.fromtimestamp(time_value).strftime('%Y年%m月%d日 %H:%M')
         
-        # タイトル
-        dt = datetime.fromtimestamp(time_value)
-        time_str = dt.strftime('%Y年%m月%d日 %H:%M')
-        ax.set_title(f'雨雲レーダー - {time_str}', 
-                    color='white', fontsize=16, fontweight='bold', pad=20)
-        
-        # 軸設定
-        ax.set_xlabel('経度 (°E)', color='white', fontsize=12)
-        ax.set_ylabel('緯度 (°N)', color='white', fontsize=12)
-        ax.grid(True, alpha=0.2, color='white', linestyle='--')
-        ax.tick_params(colors='white')
-        
-        for spine in ax.spines.values():
-            spine.set_color('white')
-        
-        # 統計情報
-        n_clusters = len(clusters['cluster'].unique()) if len(clusters) > 0 else 0
-        stats_text = f'クラスタ数: {n_clusters}\nフレーム: {frame+1}/{len(unique_times)}'
-        ax.text(0.02, 0.98, stats_text, transform=ax.transAxes,
-               color='white', fontsize=10, verticalalignment='top',
-               bbox=dict(boxstyle='round', facecolor='black', alpha=0.7))
-    
-    anim = FuncAnimation(fig, update, frames=len(unique_times), 
-                        interval=500, repeat=True)
-    
-    writer = PillowWriter(fps=2)
-    anim.save(output_path, writer=writer, dpi=100)
-    plt.close()
+        payloads.append((
+            noise[['lon', 'lat']].to_numpy(),
+            clusters[['lon', 'lat']].to_numpy(),
+            clusters['value'].to_numpy(),
+            list(zip(centers.index.astype(int).tolist(), centers['lon'].tolist(), centers['lat'].tolist())),
+            f'雨雲レーダー - {time_str}',
+            f'クラスタ数: {len(centers)}\nフレーム: {frame+1}/{n_frames}',
+        ))
+    
+    workers = max_workers or min(n_frames, os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=_init_rain_frame_worker,
+                             initargs=(xlim, ylim)) as executor:
+        frames = [Image.frombuffer('RGBA', size, buf, 'raw', 'RGBA', 0, 1)
+                  for size, buf in executor.map(_render_rain_frame, payloads)]
+    
+    # 順番どおりにGIFへまとめる（2fps = 1フレーム500ms、繰り返し再生）
+    frames[0].save(output_path, save_all=True, append_images=frames[1:],
+                   duration=500, loop=0)
     
     print(f"  ✓ アニメーション保存: {output_path}")
 
@@ -366,22 +405,33 @@ def main():
     # ========================================
     print("\n[4/4] 雨雲レーダー風の可視化を作成中...")
     
-    df = exporter.to_dataframe()
+    # 描画に使う列だけに絞り、マスク抽出のたびに不要な列をコピーしない
+    df = exporter.to_dataframe()[['time', 'cluster', 'lon', 'lat', 'value']]
+    # 描画で繰り返し走査する数値列を32bitに縮め、比較・集計時のメモリ転送量を減らす
+    df = df.astype({'lat': 'float32', 'lon': 'float32', 'value': 'float32',
+                    'cluster': 'int32', 'time': 'float64'})
+    # 時刻でソートしたインデックスを一度だけ作り、各時刻の抽出をインデックス参照で行う
+    df = df.sort_values('time', kind='stable').set_index('time', drop=False)
+    # 描画するDataFrameに実際にデータがある時刻（昇順）を一度だけ求め、静止画とアニメーションで共有する
+    frame_times = df.index.unique().tolist()
     
     # 各時刻の画像を作成
     print("\n  各時刻の静止画を作成中...")
-    for i, time_value in enumerate(unique_times[:3]):  # 最初の3時刻
+    # 静止画は1枚の図を使い回し、時刻ごとに図を作り直さない
+    fig, ax = plt.subplots(figsize=(14, 10))
+    for i, time_value in enumerate(frame_times[:3]):  # 最初の3時刻
         dt = datetime.fromtimestamp(time_value)
         filename = f"rain_radar_{dt.strftime('%Y%m%d_%H%M')}.png"
         output_path = output_dir / filename
         
         create_rain_radar_plot(df, time_value, str(output_path), 
-                              title_suffix=f"({i+1}/{len(unique_times)})")
+                              title_suffix=f"({i+1}/{len(frame_times)})", ax=ax)
+    plt.close(fig)
     
     # アニメーションを作成
     print("\n  アニメーションを作成中...")
     animation_path = output_dir / "rain_radar_animation.gif"
-    create_rain_animation(df, unique_times, str(animation_path))
+    create_rain_animation(df, frame_times, str(animation_path))
     
     # ========================================
     # 完了
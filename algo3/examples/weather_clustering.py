@@ -17,7 +17,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from st_dbscan import STDBSCAN
 from weather_data import fetch_tokyo_data
-from export_utils import ClusteringResultExporter
+from export_utils import ClusteringResultExporter, cluster_centroids
+import numpy as np
 import time
 
 
@@ -51,16 +52,18 @@ def main():
     
     # データの概要を表示
     print("\n    データの概要:")
-    latitudes = [p.lat for p in weather_points]
-    longitudes = [p.lon for p in weather_points]
-    times = [p.time for p in weather_points]
-    values = [p.value for p in weather_points]
-    
-    print(f"      緯度範囲: {min(latitudes):.2f} ~ {max(latitudes):.2f}")
-    print(f"      経度範囲: {min(longitudes):.2f} ~ {max(longitudes):.2f}")
-    print(f"      時間範囲: {min(times):.0f} ~ {max(times):.0f}")
-    print(f"      降水量: {min(values):.2f} ~ {max(values):.2f} mm/h")
-    print(f"      平均降水量: {sum(values)/len(values):.2f} mm/h")
+    # 緯度・経度・時刻・降水量を1つの配列にまとめ、最小・最大・平均を列ごとに一括計算
+    arr = np.fromiter(((p.lat, p.lon, p.time, p.value) for p in weather_points),
+                      dtype=np.dtype((np.float64, 4)), count=len(weather_points))
+    (lat_min, lon_min, time_min, value_min) = arr.min(axis=0)
+    (lat_max, lon_max, time_max, value_max) = arr.max(axis=0)
+    value_mean = arr[:, 3].mean()
+    
+    print(f"      緯度範囲: {lat_min:.2f} ~ {lat_max:.2f}")
+    print(f"      経度範囲: {lon_min:.2f} ~ {lon_max:.2f}")
+    print(f"      時間範囲: {time_min:.0f} ~ {time_max:.0f}")
+    print(f"      降水量: {value_min:.2f} ~ {value_max:.2f} mm/h")
+    print(f"      平均降水量: {value_mean:.2f} mm/h")
     
     # ========================================
     # 2. ST-DBSCANクラスタリング
@@ -105,13 +108,12 @@ def main():
         print(f"      平均: {stats['avg_cluster_size']:.1f}")
         print(f"      最大: {stats['max_cluster_size']}")
         
-        # 各クラスタの詳細
-        clusters = stdbscan.get_clusters()
+        # 各クラスタの詳細（ポイント数と平均降水量を一括集計）
+        centroids = cluster_centroids(stdbscan)
         print(f"\n    各クラスタの詳細:")
-        for cluster_id in sorted([cid for cid in clusters.keys() if cid > 0]):
-            cluster_points = [weather_points[i] for i in clusters[cluster_id]]
-            avg_value = sum(p.value for p in cluster_points) / len(cluster_points)
-            print(f"      クラスタ {cluster_id}: {len(cluster_points)} ポイント "
+        for cluster_id, n_points, avg_value in zip(
+                *(centroids[key].tolist() for key in ('cluster', 'n_points', 'value'))):
+            print(f"      クラスタ {cluster_id}: {n_points} ポイント "
                   f"(平均降水量: {avg_value:.2f} mm/h)")
     
     # ========================================
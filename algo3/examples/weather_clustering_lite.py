@@ -19,6 +19,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from st_dbscan import STDBSCAN
 from weather_data import fetch_tokyo_data
+from export_utils import cluster_centroids
+import numpy as np
 import time
 
 
@@ -40,22 +42,24 @@ def filter_by_time_and_value(weather_points, num_hours=6, min_value=1.0):
     List[WeatherPoint]
         フィルタリングされたポイント
     """
-    # 時刻でソート
-    sorted_points = sorted(weather_points, key=lambda p: p.time)
+    n = len(weather_points)
+    times_arr = np.fromiter((p.time for p in weather_points), dtype=np.float64, count=n)
+    vals_arr = np.fromiter((p.value for p in weather_points), dtype=np.float64, count=n)
     
-    # ユニークな時刻を取得
-    unique_times = sorted(list(set(p.time for p in sorted_points)))
+    # ユニークな時刻（ソート済み）と、各ポイントの時刻番号を一度に求める
+    unique_times, inv = np.unique(times_arr, return_inverse=True)
     
-    # 最初のnum_hours時間のみ
-    target_times = set(unique_times[:num_hours])
+    # 最初のnum_hours時間のみ、かつ降水量が閾値以上
+    target_mask = (inv < num_hours) & (vals_arr >= min_value)
     
-    # 時間と降水量でフィルタリング
-    filtered = [p for p in sorted_points 
-                if p.time in target_times and p.value >= min_value]
+    # 対象ポイントだけを時刻順（同時刻内は元の順序）に並べる
+    idx = np.flatnonzero(target_mask)
+    idx = idx[np.argsort(times_arr[idx], kind='stable')]
+    filtered = [weather_points[i] for i in idx]
     
     print(f"    時間範囲: 最初の {num_hours} 時間")
     print(f"    降水量閾値: {min_value} mm/h 以上")
-    print(f"    対象時刻数: {len(target_times)}")
+    print(f"    対象時刻数: {min(num_hours, len(unique_times))}")
     
     return filtered
 
@@ -100,16 +104,20 @@ def main():
         return
     
     # データの時間範囲を表示
-    times = [p.time for p in filtered_points]
-    start_time = datetime.fromtimestamp(min(times))
-    end_time = datetime.fromtimestamp(max(times))
+    # 最小・最大は配列上で求め、datetime への変換は両端の2回だけにする
+    # （表示はローカル時刻のままにするため datetime64 には変換しない）
+    times_arr = np.fromiter((p.time for p in filtered_points), dtype=np.float64,
+                            count=len(filtered_points))
+    start_time = datetime.fromtimestamp(times_arr.min())
+    end_time = datetime.fromtimestamp(times_arr.max())
     print(f"    対象期間: {start_time.strftime('%Y-%m-%d %H:%M')} ~ "
           f"{end_time.strftime('%Y-%m-%d %H:%M')}")
     
     # 降水量の統計
-    values = [p.value for p in filtered_points]
-    print(f"    降水量: {min(values):.2f} ~ {max(values):.2f} mm/h "
-          f"(平均: {sum(values)/len(values):.2f})")
+    values_arr = np.fromiter((p.value for p in filtered_points), dtype=np.float64,
+                             count=len(filtered_points))
+    print(f"    降水量: {values_arr.min():.2f} ~ {values_arr.max():.2f} mm/h "
+          f"(平均: {values_arr.mean():.2f})")
     
     # ========================================
     # ステップ3: クラスタリング
@@ -156,22 +164,18 @@ def main():
         print(f"      最大: {stats['max_cluster_size']} ポイント")
         print(f"      最小: {stats['min_cluster_size']} ポイント")
         
-        # 各クラスタの詳細
-        clusters = stdbscan.get_clusters()
+        # 各クラスタの詳細（中心・平均降水量・時間範囲を一括集計）
+        centroids = cluster_centroids(stdbscan)
         print(f"\n    各クラスタの詳細:")
-        for cluster_id in sorted([cid for cid in clusters.keys() if cid > 0]):
-            cluster_points = [filtered_points[i] for i in clusters[cluster_id]]
-            avg_value = sum(p.value for p in cluster_points) / len(cluster_points)
-            avg_lat = sum(p.lat for p in cluster_points) / len(cluster_points)
-            avg_lon = sum(p.lon for p in cluster_points) / len(cluster_points)
-            
+        for cluster_id, n_points, avg_lat, avg_lon, avg_value, min_t, max_t in zip(
+                *(centroids[key].tolist() for key in
+                  ('cluster', 'n_points', 'lat', 'lon', 'value', 'min_time', 'max_time'))):
             # 時間範囲
-            times_in_cluster = [p.time for p in cluster_points]
-            start_t = datetime.fromtimestamp(min(times_in_cluster))
-            end_t = datetime.fromtimestamp(max(times_in_cluster))
+            start_t = datetime.fromtimestamp(min_t)
+            end_t = datetime.fromtimestamp(max_t)
             
             print(f"      クラスタ {cluster_id}:")
-            print(f"        ポイント数: {len(cluster_points)}")
+            print(f"        ポイント数: {n_points}")
             print(f"        中心位置: {avg_lat:.2f}°N, {avg_lon:.2f}°E")
             print(f"        平均降水量: {avg_value:.2f} mm/h")
             print(f"        時間範囲: {start_t.strftime('%H:%M')} ~ {end_t.strftime('%H:%M')}")
@@ -20,6 +20,8 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from st_dbscan import STDBSCAN
 from weather_data import fetch_tokyo_data
+from export_utils import cluster_centroids
+import numpy as np
 import time
 
 
@@ -41,24 +43,25 @@ def filter_by_time_range(weather_points, start_idx=0, num_hours=24):
     List[WeatherPoint]
         フィルタリングされたポイント
     """
-    # 時刻でソート
-    sorted_points = sorted(weather_points, key=lambda p: p.time)
+    times_arr = np.fromiter((p.time for p in weather_points), dtype=np.float64,
+                            count=len(weather_points))
     
-    # ユニークな時刻を取得
-    unique_times = sorted(list(set(p.time for p in sorted_points)))
+    # ユニークな時刻（ソート済み）と、各ポイントの時刻番号を一度に求める
+    unique_times, inv = np.unique(times_arr, return_inverse=True)
     
     if start_idx >= len(unique_times):
         return []
     
     # 対象時間範囲を決定
     end_idx = min(start_idx + num_hours, len(unique_times))
-    target_times = set(unique_times[start_idx:end_idx])
     
-    # フィルタリング
-    filtered = [p for p in sorted_points if p.time in target_times]
+    # フィルタリング（時刻番号の範囲で判定し、時刻順・同時刻内は元の順序に並べる）
+    idx = np.flatnonzero((inv >= start_idx) & (inv < end_idx))
+    idx = idx[np.argsort(times_arr[idx], kind='stable')]
+    filtered = [weather_points[i] for i in idx]
     
     print(f"    時間範囲: {start_idx}時間目 ~ {end_idx}時間目")
-    print(f"    対象時刻数: {len(target_times)}")
+    print(f"    対象時刻数: {end_idx - start_idx}")
     
     return filtered
 
@@ -97,9 +100,12 @@ def main():
         return
     
     # データの時間範囲を表示
-    times = [p.time for p in filtered_points]
-    start_time = datetime.fromtimestamp(min(times))
-    end_time = datetime.fromtimestamp(max(times))
+    # 最小・最大は配列上で求め、datetime への変換は両端の2回だけにする
+    # （表示はローカル時刻のままにするため datetime64 には変換しない）
+    times_arr = np.fromiter((p.time for p in filtered_points), dtype=np.float64,
+                            count=len(filtered_points))
+    start_time = datetime.fromtimestamp(times_arr.min())
+    end_time = datetime.fromtimestamp(times_arr.max())
     print(f"    対象期間: {start_time.strftime('%Y-%m-%d %H:%M')} ~ "
           f"{end_time.strftime('%Y-%m-%d %H:%M')}")
     
@@ -144,15 +150,13 @@ def main():
         print(f"      最大: {stats['max_cluster_size']} ポイント")
         print(f"      最小: {stats['min_cluster_size']} ポイント")
         
-        # 各クラスタの詳細
-        clusters = stdbscan.get_clusters()
+        # 各クラスタの詳細（中心・平均降水量を一括集計し、先頭5件を表示）
+        centroids = cluster_centroids(stdbscan)
         print(f"\n    各クラスタの詳細:")
-        for cluster_id in sorted([cid for cid in clusters.keys() if cid > 0])[:5]:
-            cluster_points = [filtered_points[i] for i in clusters[cluster_id]]
-            avg_value = sum(p.value for p in cluster_points) / len(cluster_points)
-            avg_lat = sum(p.lat for p in cluster_points) / len(cluster_points)
-            avg_lon = sum(p.lon for p in cluster_points) / len(cluster_points)
-            print(f"      クラスタ {cluster_id}: {len(cluster_points)} ポイント "
+        for cluster_id, n_points, avg_lat, avg_lon, avg_value in zip(
+                *(centroids[key][:5].tolist() for key in
+                  ('cluster', 'n_points', 'lat', 'lon', 'value'))):
+            print(f"      クラスタ {cluster_id}: {n_points} ポイント "
                   f"(中心: {avg_lat:.2f}°N, {avg_lon:.2f}°E, "
                   f"平均降水量: {avg_value:.2f} mm/h)")
         
@@ -6,11 +6,136 @@
 """
 
 import json
+import functools
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import numpy as np
 from typing import List, Dict, Tuple
 from st_dbscan import STDBSCAN, STPoint
 
+try:
+    import orjson
+except ImportError:  # orjson は任意（未導入なら標準の json で書き出す）
+    orjson = None
+
+try:
+    from numba import njit
+except ImportError:  # numba は任意（未導入なら NumPy の reduceat で集計する）
+    njit = None
+
+
+def _json_bytes(obj, pretty: bool = False) -> bytes:
+    """
+    JSONをUTF-8のバイト列にする（orjson があればそちらでエンコード）
+    
+    pretty=True ならインデント2、False なら空白なしのコンパクト形式
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+    if pretty:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _write_json(obj, filepath: str, pretty: bool = False):
+    """JSONをバイナリモードのファイルへ直接書き出す（文字列を経由しない）"""
+    with open(filepath, 'wb') as f:
+        f.write(_json_bytes(obj, pretty))
+
+
+def _cluster_bounds_numpy(clusters, lats, lons, times):
+    """クラスタIDで並べ替えた連続区間を reduceat でまとめて集計する"""
+    order = np.argsort(clusters, kind='stable')
+    cluster_ids, starts, counts = np.unique(clusters[order],
+                                            return_index=True, return_counts=True)
+    lats = lats[order]
+    lons = lons[order]
+    times = times[order]
+    
+    columns = {
+        'min_lat': np.minimum.reduceat(lats, starts),
+        'max_lat': np.maximum.reduceat(lats, starts),
+        'min_lon': np.minimum.reduceat(lons, starts),
+        'max_lon': np.maximum.reduceat(lons, starts),
+        'min_time': np.minimum.reduceat(times, starts),
+        'max_time': np.maximum.reduceat(times, starts),
+        'center_lat': np.add.reduceat(lats, starts) / counts,
+        'center_lon': np.add.reduceat(lons, starts) / counts,
+        'n_points': counts,
+    }
+    return cluster_ids, columns
+
+
+if njit is not None:
+    @njit(cache=True)
+    def _cluster_bounds_kernel(clusters, lats, lons, times, n_ids):
+        """クラスタIDを添字にして、並べ替えなしの1パスで範囲・合計・件数を集計する"""
+        # 列: min_lat, max_lat, min_lon, max_lon, min_time, max_time, sum_lat, sum_lon
+        stats = np.empty((n_ids, 8))
+        stats[:, 0:6:2] = np.inf
+        stats[:, 1:6:2] = -np.inf
+        stats[:, 6:] = 0.0
+        counts = np.zeros(n_ids, dtype=np.int64)
+        
+        for i in range(clusters.size):
+            c = clusters[i]
+            lat = lats[i]
+            lon = lons[i]
+            t = times[i]
+            if lat < stats[c, 0]:
+                stats[c, 0] = lat
+            if lat > stats[c, 1]:
+                stats[c, 1] = lat
+            if lon < stats[c, 2]:
+                stats[c, 2] = lon
+            if lon > stats[c, 3]:
+                stats[c, 3] = lon
+            if t < stats[c, 4]:
+                stats[c, 4] = t
+            if t > stats[c, 5]:
+                stats[c, 5] = t
+            stats[c, 6] += lat
+            stats[c, 7] += lon
+            counts[c] += 1
+        
+        return stats, counts
+
+
+def _cluster_bounds_numba(clusters, lats, lons, times):
+    """Numba のカーネルで集計し、_cluster_bounds_numpy と同じ形で返す"""
+    stats, counts = _cluster_bounds_kernel(clusters, lats, lons, times,
+                                           int(clusters.max()) + 1)
+    cluster_ids = np.flatnonzero(counts)
+    stats = stats[cluster_ids]
+    counts = counts[cluster_ids]
+    
+    columns = {
+        'min_lat': stats[:, 0],
+        'max_lat': stats[:, 1],
+        'min_lon': stats[:, 2],
+        'max_lon': stats[:, 3],
+        'min_time': stats[:, 4],
+        'max_time': stats[:, 5],
+        'center_lat': stats[:, 6] / counts,
+        'center_lon': stats[:, 7] / counts,
+        'n_points': counts,
+    }
+    return cluster_ids, columns
+
+
+def _cached(method):
+    """結果を self._cache に（メソッド名, 引数）をキーとして保存し、2回目以降は再計算しない"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        if key not in self._cache:
+            self._cache[key] = method(self, *args, **kwargs)
+        return self._cache[key]
+    return wrapper
+
 
 class ClusteringResultExporter:
     """
@@ -28,6 +153,52 @@ class ClusteringResultExporter:
         """
         self.stdbscan = stdbscan
         self.points = stdbscan.points
+        # to_dataframe() の結果をキャッシュ（CSV出力と可視化で同じ表を使い回す）
+        self._dataframe = None
+        # ポイントの属性を列ごとにまとめた配列（_point_arrays() で初回に作成）
+        self._arrays = None
+        # クラスタ範囲・色・時刻ごとのグループなど派生情報のキャッシュ（_cached を参照）
+        self._cache = {}
+    
+    def _point_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        ポイントの属性を列ごとのNumPy配列として取得
+        
+        ポイントのリストを1回だけ走査して全属性を詰め、以降の呼び出しでは同じ配列を返す
+        
+        Returns
+        -------
+        Dict[str, np.ndarray]
+            'id', 'lat', 'lon', 'time', 'value', 'cluster' をキーとする配列の辞書
+        """
+        if self._arrays is not None:
+            return self._arrays
+        
+        n = len(self.points)
+        ids = np.empty(n, dtype=np.int64)
+        lats = np.empty(n, dtype=np.float64)
+        lons = np.empty(n, dtype=np.float64)
+        times = np.empty(n, dtype=np.float64)
+        values = np.empty(n, dtype=np.float64)
+        clusters = np.empty(n, dtype=np.int32)
+        
+        for i, p in enumerate(self.points):
+            ids[i] = p.id
+            lats[i] = p.lat
+            lons[i] = p.lon
+            times[i] = p.time
+            values[i] = p.value
+            clusters[i] = p.cluster
+        
+        self._arrays = {
+            'id': ids,
+            'lat': lats,
+            'lon': lons,
+            'time': times,
+            'value': values,
+            'cluster': clusters,
+        }
+        return self._arrays
     
     def to_dataframe(self) -> pd.DataFrame:
         """
@@ -44,19 +215,22 @@ class ClusteringResultExporter:
             - value: 降水量などの値
             - cluster: クラスタID (0=ノイズ, 1~=クラスタ)
             - is_noise: ノイズかどうか
+
+        Notes
+        -----
+        結果は初回呼び出し時に作成してキャッシュし、以降は同じ DataFrame を返す。
+        呼び出し側で列を書き換える場合は ``copy()`` してから使うこと。
         """
-        data = {
-            'id': [p.id for p in self.points],
-            'lat': [p.lat for p in self.points],
-            'lon': [p.lon for p in self.points],
-            'time': [p.time for p in self.points],
-            'value': [p.value for p in self.points],
-            'cluster': [p.cluster for p in self.points],
-            'is_noise': [p.cluster == 0 for p in self.points]
-        }
-        return pd.DataFrame(data)
+        if self._dataframe is not None:
+            return self._dataframe
+        
+        arrays = self._point_arrays()
+        data = dict(arrays)
+        data['is_noise'] = arrays['cluster'] == 0
+        self._dataframe = pd.DataFrame(data)
+        return self._dataframe
     
-    def to_json(self, filepath: str = None) -> str:
+    def to_json(self, filepath: str = None, pretty: bool = False) -> str:
         """
         クラスタリング結果をJSON形式でエクスポート
         
@@ -64,16 +238,30 @@ class ClusteringResultExporter:
         ----------
         filepath : str, optional
             保存先のファイルパス。Noneの場合はJSON文字列を返す
+        pretty : bool
+            Trueならインデント付きで整形する（デフォルトは空白なしのコンパクト形式）
             
         Returns
         -------
         str
             JSON文字列
         """
-        result = {
+        json_bytes = _json_bytes(self._json_result(), pretty)
+        
+        if filepath:
+            with open(filepath, 'wb') as f:
+                f.write(json_bytes)
+            print(f"JSON exported to: {filepath}")
+        
+        return json_bytes.decode('utf-8')
+    
+    def _json_result(self) -> Dict:
+        """to_json で書き出す辞書を組み立てる"""
+        arrays = self._point_arrays()
+        return {
             'metadata': {
                 'n_points': len(self.points),
-                'n_clusters': self.stdbscan.get_statistics()['n_clusters'],
+                'n_clusters': sum(1 for cid in self.get_cluster_bounds() if cid > 0),
                 'parameters': {
                     'eps1': self.stdbscan.eps1,
                     'eps2': self.stdbscan.eps2,
@@ -82,26 +270,19 @@ class ClusteringResultExporter:
             },
             'points': [
                 {
-                    'id': p.id,
-                    'lat': p.lat,
-                    'lon': p.lon,
-                    'time': p.time,
-                    'value': p.value,
-                    'cluster': p.cluster
+                    'id': pid,
+                    'lat': lat,
+                    'lon': lon,
+                    'time': time,
+                    'value': value,
+                    'cluster': cluster
                 }
-                for p in self.points
+                for pid, lat, lon, time, value, cluster in zip(
+                    *(arrays[key].tolist() for key in ('id', 'lat', 'lon', 'time', 'value', 'cluster'))
+                )
             ],
             'clusters': self._get_cluster_summaries()
         }
-        
-        json_str = json.dumps(result, indent=2, ensure_ascii=False)
-        
-        if filepath:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(json_str)
-            print(f"JSON exported to: {filepath}")
-        
-        return json_str
     
     def to_csv(self, filepath: str = 'clustering_result.csv'):
         """
@@ -112,10 +293,44 @@ class ClusteringResultExporter:
         filepath : str
             保存先のファイルパス
         """
+        # 出力形式（"138.0" や True/False の表記）を環境によらず揃えるため、書き出しは常に pandas で行う
         df = self.to_dataframe()
         df.to_csv(filepath, index=False, encoding='utf-8')
         print(f"CSV exported to: {filepath}")
     
+    @_cached
+    def _time_cluster_groups(self):
+        """
+        (時刻, クラスタID) ごとのグループを配列上の区間として求める
+        
+        Returns
+        -------
+        tuple
+            (order, groups)。order は (時刻, クラスタID) 順に並べたポイントの添字、
+            groups は [(時刻, クラスタID, 開始, 終了)] で order[開始:終了] が各グループ
+        """
+        arrays = self._point_arrays()
+        times = arrays['time']
+        clusters = arrays['cluster']
+        
+        # (時刻, クラスタID) の順に一度だけ並べ替え、連続区間ごとに切り出す
+        # （lexsort は安定なので、同じグループ内は元の順序のまま）
+        order = np.lexsort((clusters, times))
+        sorted_times = times[order]
+        sorted_clusters = clusters[order]
+        
+        # 時刻またはクラスタIDが変わる位置がグループの先頭
+        is_start = np.empty(len(order), dtype=bool)
+        is_start[:1] = True
+        is_start[1:] = (sorted_times[1:] != sorted_times[:-1]) | (sorted_clusters[1:] != sorted_clusters[:-1])
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], len(order))
+        
+        groups = list(zip(sorted_times[starts].tolist(), sorted_clusters[starts].tolist(),
+                          starts.tolist(), ends.tolist()))
+        return order, groups
+    
+    @_cached
     def get_clusters_by_time(self) -> Dict[float, Dict[int, List[STPoint]]]:
         """
         時刻ごとにクラスタをグループ化
@@ -125,22 +340,20 @@ class ClusteringResultExporter:
         Dict[float, Dict[int, List[STPoint]]]
             {時刻: {クラスタID: [ポイントのリスト]}}
         """
-        clusters_by_time = {}
+        order, groups = self._time_cluster_groups()
         
-        for point in self.points:
-            time = point.time
-            cluster_id = point.cluster
-            
+        # STPoint は最後に葉の部分でだけ参照する
+        points = self.points
+        order_list = order.tolist()
+        clusters_by_time = {}
+        for time, cluster_id, start, end in groups:
             if time not in clusters_by_time:
                 clusters_by_time[time] = {}
-            
-            if cluster_id not in clusters_by_time[time]:
-                clusters_by_time[time][cluster_id] = []
-            
-            clusters_by_time[time][cluster_id].append(point)
+            clusters_by_time[time][cluster_id] = [points[i] for i in order_list[start:end]]
         
         return clusters_by_time
     
+    @_cached
     def get_cluster_colors(self, cmap_name: str = 'tab20') -> Dict[int, Tuple[float, float, float, float]]:
         """
         各クラスタに色を割り当て
@@ -155,29 +368,26 @@ class ClusteringResultExporter:
         Dict[int, Tuple[float, float, float, float]]
             {クラスタID: (R, G, B, A)} の辞書
         """
-        import matplotlib.cm as cm
-        import matplotlib.colors as mcolors
+        import matplotlib
         
-        clusters = self.stdbscan.get_clusters()
-        cluster_ids = sorted([cid for cid in clusters.keys() if cid > 0])
+        cluster_ids = [cid for cid in self.get_cluster_bounds() if cid > 0]  # 昇順
         
         if not cluster_ids:
             return {}
         
-        cmap = cm.get_cmap(cmap_name)
+        cmap = matplotlib.colormaps[cmap_name]
         colors = {}
         
         # ノイズは灰色
         colors[0] = (0.5, 0.5, 0.5, 0.3)
         
-        # 各クラスタに色を割り当て
-        n_clusters = len(cluster_ids)
-        for i, cid in enumerate(cluster_ids):
-            color = cmap(i / max(n_clusters - 1, 1))
-            colors[cid] = color
+        # 各クラスタに色を割り当て（カラーマップは 0〜1 を等分した位置で一括参照）
+        rgba = cmap(np.linspace(0, 1, len(cluster_ids)))
+        colors.update(zip(cluster_ids, map(tuple, rgba.tolist())))
         
         return colors
     
+    @_cached
     def get_cluster_bounds(self) -> Dict[int, Dict[str, float]]:
         """
         各クラスタの空間的・時間的範囲を取得
@@ -190,53 +400,42 @@ class ClusteringResultExporter:
                 'min_time', 'max_time', 'center_lat', 'center_lon'
             }}
         """
-        clusters = self.stdbscan.get_clusters()
-        bounds = {}
+        arrays = self._point_arrays()
+        clusters = arrays['cluster']
         
-        for cluster_id, point_indices in clusters.items():
+        # numba があればクラスタIDを添字にした1パスで、無ければ並べ替え＋reduceatで集計する
+        # （未分類 -1 が残っている場合は添字にできないので NumPy 側を使う）
+        if njit is not None and len(clusters) > 0 and clusters.min() >= 0:
+            cluster_bounds = _cluster_bounds_numba
+        else:
+            cluster_bounds = _cluster_bounds_numpy
+        cluster_ids, columns = cluster_bounds(clusters, arrays['lat'], arrays['lon'], arrays['time'])
+        columns = {key: values.tolist() for key, values in columns.items()}
+        
+        bounds = {}
+        for i, cluster_id in enumerate(cluster_ids.tolist()):
             if cluster_id == 0:  # ノイズは除外
                 continue
-            
-            cluster_points = [self.points[i] for i in point_indices]
-            
-            lats = [p.lat for p in cluster_points]
-            lons = [p.lon for p in cluster_points]
-            times = [p.time for p in cluster_points]
-            
-            bounds[cluster_id] = {
-                'min_lat': min(lats),
-                'max_lat': max(lats),
-                'min_lon': min(lons),
-                'max_lon': max(lons),
-                'min_time': min(times),
-                'max_time': max(times),
-                'center_lat': np.mean(lats),
-                'center_lon': np.mean(lons),
-                'n_points': len(cluster_points)
-            }
+            bounds[cluster_id] = {key: values[i] for key, values in columns.items()}
         
         return bounds
     
     def _get_cluster_summaries(self) -> List[Dict]:
         """クラスタの要約情報を取得"""
-        clusters = self.stdbscan.get_clusters()
-        bounds = self.get_cluster_bounds()
+        bounds = self.get_cluster_bounds()  # ノイズを除いたクラスタID昇順
         summaries = []
         
-        for cluster_id in sorted(clusters.keys()):
-            if cluster_id == 0:  # ノイズ
-                continue
-            
+        for cluster_id, cluster_bounds in bounds.items():
             summary = {
                 'cluster_id': cluster_id,
-                'n_points': len(clusters[cluster_id]),
-                'bounds': bounds.get(cluster_id, {})
+                'n_points': cluster_bounds['n_points'],
+                'bounds': cluster_bounds
             }
             summaries.append(summary)
         
         return summaries
     
-    def export_for_visualization(self, output_dir: str = '.'):
+    def export_for_visualization(self, output_dir: str = '.', pretty: bool = False):
         """
         可視化に必要な全てのデータをエクスポート
         
@@ -244,18 +443,16 @@ class ClusteringResultExporter:
         ----------
         output_dir : str
             出力ディレクトリ
+        pretty : bool
+            TrueならJSONファイルをインデント付きで整形する
+            （デフォルトは空白なしのコンパクト形式）
         """
         import os
         
         os.makedirs(output_dir, exist_ok=True)
         
-        # CSV形式
-        csv_path = os.path.join(output_dir, 'clustering_result.csv')
-        self.to_csv(csv_path)
-        
         # JSON形式
-        json_path = os.path.join(output_dir, 'clustering_result.json')
-        self.to_json(json_path)
+        result = self._json_result()
         
         # クラスタの色情報
         colors = self.get_cluster_colors()
@@ -268,39 +465,51 @@ class ClusteringResultExporter:
             }
             for cid, c in colors.items()
         }
-        colors_path = os.path.join(output_dir, 'cluster_colors.json')
-        with open(colors_path, 'w', encoding='utf-8') as f:
-            json.dump(colors_dict, f, indent=2)
-        print(f"Cluster colors exported to: {colors_path}")
         
         # クラスタの境界情報
         bounds = self.get_cluster_bounds()
-        bounds_path = os.path.join(output_dir, 'cluster_bounds.json')
-        with open(bounds_path, 'w', encoding='utf-8') as f:
-            json.dump(bounds, f, indent=2)
-        print(f"Cluster bounds exported to: {bounds_path}")
         
-        # 時刻ごとのデータ
-        clusters_by_time = self.get_clusters_by_time()
-        time_data = {}
-        for time, clusters in clusters_by_time.items():
-            time_data[str(time)] = {
-                str(cluster_id): [
-                    {
-                        'lat': p.lat,
-                        'lon': p.lon,
-                        'value': p.value,
-                        'cluster': p.cluster
-                    }
-                    for p in points
-                ]
-                for cluster_id, points in clusters.items()
+        # 時刻ごとのデータ（STPoint を経由せず、グループ順に並べた列配列から直接作る）
+        order, groups = self._time_cluster_groups()
+        arrays = self._point_arrays()
+        # レコードはグループ順に一括で作り、各グループにはその区間のスライスを割り当てる
+        records = [
+            {
+                'lat': lat,
+                'lon': lon,
+                'value': value,
+                'cluster': cluster
             }
+            for lat, lon, value, cluster in zip(
+                *(arrays[key][order].tolist() for key in ('lat', 'lon', 'value', 'cluster'))
+            )
+        ]
+        time_data = {}
+        for time, cluster_id, start, end in groups:
+            time_key = str(time)
+            if time_key not in time_data:
+                time_data[time_key] = {}
+            time_data[time_key][str(cluster_id)] = records[start:end]
         
-        time_path = os.path.join(output_dir, 'clusters_by_time.json')
-        with open(time_path, 'w', encoding='utf-8') as f:
-            json.dump(time_data, f, indent=2)
-        print(f"Time-based clusters exported to: {time_path}")
+        # 内容はすべて組み立て済みなので、4つのJSONの書き出しはスレッドに任せ、
+        # その間にCSVを書き出す
+        json_files = [
+            ('JSON', 'clustering_result.json', result),
+            ('Cluster colors', 'cluster_colors.json', colors_dict),
+            ('Cluster bounds', 'cluster_bounds.json', bounds),
+            ('Time-based clusters', 'clusters_by_time.json', time_data),
+        ]
+        with ThreadPoolExecutor(max_workers=len(json_files)) as executor:
+            futures = [executor.submit(_write_json, obj, os.path.join(output_dir, filename), pretty)
+                       for _, filename, obj in json_files]
+            
+            # CSV形式
+            csv_path = os.path.join(output_dir, 'clustering_result.csv')
+            self.to_csv(csv_path)
+            
+            for (label, filename, _), future in zip(json_files, futures):
+                future.result()  # 書き出し中の例外はここで送出される
+                print(f"{label} exported to: {os.path.join(output_dir, filename)}")
         
         print(f"\nAll visualization data exported to: {output_dir}")
         print("Files created:")
@@ -337,6 +546,55 @@ def load_clustering_result(filepath: str) -> pd.DataFrame:
         raise ValueError("Unsupported file format. Use .csv or .json")
 
 
+def cluster_centroids(stdbscan: STDBSCAN) -> Dict[str, np.ndarray]:
+    """
+    各クラスタ（ノイズを除く）の中心・平均降水量・時間範囲をまとめて計算
+    
+    ポイントの属性を1回の走査で配列にし、クラスタIDで並べ替えた連続区間を
+    reduceat で一括集計する
+    
+    Parameters
+    ----------
+    stdbscan : STDBSCAN
+        クラスタリング済みのSTDBSCANインスタンス
+        
+    Returns
+    -------
+    Dict[str, np.ndarray]
+        クラスタID昇順の配列の辞書:
+        - cluster: クラスタID
+        - n_points: ポイント数
+        - lat, lon: 中心（平均）の緯度・経度
+        - value: 平均降水量
+        - min_time, max_time: 時間範囲
+    """
+    points = stdbscan.points
+    arr = np.fromiter(((p.cluster, p.lat, p.lon, p.value, p.time) for p in points),
+                      dtype=np.dtype((np.float64, 5)), count=len(points))
+    arr = arr[arr[:, 0] > 0]  # ノイズ・未分類は除外
+    
+    if len(arr) == 0:
+        empty = np.empty(0)
+        return {'cluster': np.empty(0, dtype=np.int64), 'n_points': np.empty(0, dtype=np.int64),
+                'lat': empty, 'lon': empty, 'value': empty,
+                'min_time': empty, 'max_time': empty}
+    
+    arr = arr[np.argsort(arr[:, 0], kind='stable')]
+    cluster_ids, starts, counts = np.unique(arr[:, 0].astype(np.int64),
+                                            return_index=True, return_counts=True)
+    sums = np.add.reduceat(arr[:, 1:4], starts, axis=0)
+    
+    return {
+        'cluster': cluster_ids,
+        'n_points': counts,
+        'lat': sums[:, 0] / counts,
+        'lon': sums[:, 1] / counts,
+        'value': sums[:, 2] / counts,
+        'min_time': np.minimum.reduceat(arr[:, 4], starts),
+        'max_time': np.maximum.reduceat(arr[:, 4], starts),
+    }
+
+
 def get_visualization_guide() -> str:
     """
     可視化担当者向けのガイドを返す
@@ -6,49 +6,59 @@ Windows環境でmatplotlibの日本語表示を有効化
 
 import matplotlib.pyplot as plt
 import matplotlib
+from matplotlib.font_manager import FontProperties, findfont
 import platform
+import re
+
+# OSごとの日本語フォント候補（先頭から順に、実際にインストールされているものを使う）
+FONT_CANDIDATES = {
+    'Windows': ['MS Gothic', 'Yu Gothic', 'Meiryo'],
+    'Darwin': ['Hiragino Sans'],  # macOS
+    'Linux': ['Noto Sans CJK JP', 'IPAGothic'],
+}
+
+# 日本語フォントらしい名前に含まれるキーワード（1回の検索で判定できるよう正規表現にまとめる）
+JAPANESE_FONT_PATTERN = re.compile(r'Gothic|Mincho|Meiryo|Yu|MS|Hiragino|Noto|IPA')
+
+# 設定済みかどうかと、選ばれたフォント名（複数のモジュールから呼ばれても一度だけ探索する）
+_font_configured = False
+_resolved_font = None
+
+
+def _font_available(name):
+    """フォントがインストールされているかを確認（代替フォントへのフォールバックは許さない）"""
+    try:
+        findfont(FontProperties(family=name), fallback_to_default=False)
+        return True
+    except ValueError:
+        return False
 
 
 def setup_japanese_font():
     """
     matplotlibで日本語を表示できるように設定
     
-    Windows環境でのフォント設定を自動的に行う
+    OSごとの候補から実際にインストールされているフォントを探して設定する。
+    結果はモジュール内に保持し、2回目以降の呼び出しでは探索しない
     """
-    system = platform.system()
-    
-    if system == 'Windows':
-        # Windowsの場合
-        try:
-            # MS Gothic (游ゴシック) を試す
-            plt.rcParams['font.family'] = 'MS Gothic'
-        except:
-            try:
-                # Yu Gothic を試す
-                plt.rcParams['font.family'] = 'Yu Gothic'
-            except:
-                try:
-                    # Meiryo を試す
-                    plt.rcParams['font.family'] = 'Meiryo'
-                except:
-                    print("Warning: Could not set Japanese font. Japanese text may not display correctly.")
-    
-    elif system == 'Darwin':  # macOS
-        plt.rcParams['font.family'] = 'Hiragino Sans'
+    global _font_configured, _resolved_font
+    if _font_configured:
+        return _resolved_font
     
-    elif system == 'Linux':
-        try:
-            plt.rcParams['font.family'] = 'Noto Sans CJK JP'
-        except:
-            try:
-                plt.rcParams['font.family'] = 'IPAGothic'
-            except:
-                print("Warning: Could not set Japanese font. Japanese text may not display correctly.")
+    for name in FONT_CANDIDATES.get(platform.system(), []):
+        if _font_available(name):
+            plt.rcParams['font.family'] = name
+            _resolved_font = name
+            break
+    else:
+        print("Warning: Could not set Japanese font. Japanese text may not display correctly.")
     
     # マイナス記号の文字化け対策
     plt.rcParams['axes.unicode_minus'] = False
     
     print(f"Font set to: {plt.rcParams['font.family']}")
+    _font_configured = True
+    return _resolved_font
 
 
 def get_available_fonts():
@@ -62,12 +72,11 @@ def get_available_fonts():
     """
     import matplotlib.font_manager as fm
     
-    fonts = [f.name for f in fm.fontManager.ttflist]
-    japanese_fonts = [f for f in fonts if any(
-        keyword in f for keyword in ['Gothic', 'Mincho', 'Meiryo', 'Yu', 'MS', 'Hiragino', 'Noto', 'IPA']
-    )]
+    # 同じフォント名の重複を先に除いてから判定する
+    fonts = {f.name for f in fm.fontManager.ttflist}
+    japanese_fonts = [f for f in fonts if JAPANESE_FONT_PATTERN.search(f)]
     
-    return sorted(set(japanese_fonts))
+    return sorted(japanese_fonts)
 
 
 if __name__ == "__main__":
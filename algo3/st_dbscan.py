@@ -9,13 +9,66 @@ Birant, D., & Kut, A. (2007). ST-DBSCAN: An algorithm for clustering
 spatial-temporal data. Data & Knowledge Engineering, 60(1), 208-221.
 """
 
+import os
+import sys
 import numpy as np
 from typing import List, Tuple, Set
 from dataclasses import dataclass
-from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
+try:
+    from scipy.spatial import cKDTree
+except ImportError:  # scipy は任意（未導入なら時間方向の絞り込みだけで候補を選ぶ）
+    cKDTree = None
 
-@dataclass
+try:
+    from numba import njit
+except ImportError:  # numba は任意（未導入なら NumPy の一括計算で判定する）
+    njit = None
+
+EARTH_RADIUS_KM = 6371.0  # 地球の半径 (km)
+
+# 格子インデックスを使うのは、格子のセル数がポイント数のこの倍数以下のときだけにする
+_GRID_MAX_CELLS_PER_POINT = 32
+
+# Python 3.10 以降ではポイントを __slots__ 付きにして、1点ごとの __dict__ を持たせない
+_DATACLASS_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+
+if njit is not None:
+    @njit(cache=True, nogil=True)
+    def _st_neighbors_kernel(lats, lons, times, cos_lats, candidates, point_id, eps1, eps2,
+                             dlat_max, dlon_max):
+        """候補を1つずつ走査し、get_neighbors と同じ式でST近傍のIDだけを順に詰めて返す"""
+        lat1 = lats[point_id]
+        lon1 = lons[point_id]
+        time1 = times[point_id]
+        cos_lat1 = cos_lats[point_id]
+        
+        neighbors = np.empty(len(candidates), dtype=np.int64)
+        n_neighbors = 0
+        for j in candidates:
+            # 時間距離の判定を先に行い、範囲外なら三角関数の計算を省く
+            if j == point_id or abs(time1 - times[j]) > eps2:
+                continue
+            
+            # 緯度差・経度差で明らかに遠い点も、三角関数の計算の前に落とす
+            if abs(lats[j] - lat1) > dlat_max or abs(lons[j] - lon1) > dlon_max:
+                continue
+            
+            dlon = np.radians(lons[j] - lon1)
+            dlat = np.radians(lats[j] - lat1)
+            a = (np.sin(dlat / 2)**2
+                 + cos_lat1 * cos_lats[j] * np.sin(dlon / 2)**2)
+            c = 2 * np.arcsin(np.sqrt(a))
+            if EARTH_RADIUS_KM * c <= eps1:
+                neighbors[n_neighbors] = j
+                n_neighbors += 1
+        
+        return neighbors[:n_neighbors]
+
+
+@dataclass(**_DATACLASS_SLOTS)
 class STPoint:
     """時空間データポイント"""
     id: int
@@ -38,33 +91,43 @@ class STDBSCAN:
         時間的な近傍半径 (時間単位)
     min_pts : int
         コアポイントとなるための最小ポイント数
+    n_jobs : int
+        近傍の事前計算に使うスレッド数 (-1で全CPU)。
+        1ならクラスタ拡張の途中で近傍を都度計算する。
+        2以上では全ポイントの近傍を並列に求めて保持するため、その分メモリを使う
     """
     
-    def __init__(self, eps1: float, eps2: float, min_pts: int):
+    def __init__(self, eps1: float, eps2: float, min_pts: int, n_jobs: int = 1):
         self.eps1 = eps1  # 空間距離の閾値 (km)
         self.eps2 = eps2  # 時間距離の閾値
         self.min_pts = min_pts  # 最小ポイント数
+        self.n_jobs = n_jobs  # 近傍の事前計算に使うスレッド数
         self.points: List[STPoint] = []
         self.cluster_id = 0
+        self._clusters = np.empty(0, dtype=np.int32)  # 各ポイントのクラスタID
+        self._neighbor_table = None  # 事前計算した近傍（n_jobs が2以上のとき）
+        self._grid = None  # 格子データの場合の候補検索用インデックス
         
     def haversine_distance(self, lat1: float, lon1: float, 
                           lat2: float, lon2: float) -> float:
         """
         2点間の距離をHaversine公式で計算 (km)
         
+        NumPyのufuncで計算するため、配列を渡すと要素ごとの距離をまとめて返す
+        
         Parameters
         ----------
-        lat1, lon1 : float
+        lat1, lon1 : float or np.ndarray
             地点1の緯度・経度
-        lat2, lon2 : float
+        lat2, lon2 : float or np.ndarray
             地点2の緯度・経度
             
         Returns
         -------
-        float
+        float or np.ndarray
             2点間の距離 (km)
         """
-        R = 6371.0  # 地球の半径 (km)
+        R = EARTH_RADIUS_KM
         
         lat1_rad = np.radians(lat1)
         lat2_rad = np.radians(lat2)
@@ -72,7 +135,7 @@ class STDBSCAN:
         dlat = np.radians(lat2 - lat1)
         
         a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
-        c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+        c = 2 * np.arcsin(np.sqrt(a))
         
         return R * c
     
@@ -82,12 +145,12 @@ class STDBSCAN:
         
         Parameters
         ----------
-        time1, time2 : float
+        time1, time2 : float or np.ndarray
             2つの時刻
             
         Returns
         -------
-        float
+        float or np.ndarray
             時間距離の絶対値
         """
         return abs(time1 - time2)
@@ -108,29 +171,147 @@ class STDBSCAN:
         List[int]
             近傍ポイントのIDリスト
         """
-        neighbors = []
-        center_point = self.points[point_id]
+        return self._neighbors(point_id).tolist()
+    
+    def _neighbors(self, point_id: int) -> np.ndarray:
+        """get_neighbors と同じ近傍を、IDの配列（昇順）で返す"""
+        if self._neighbor_table is not None:
+            return self._neighbor_table[point_id]
+        return self._query_neighbors(point_id)
+    
+    def _query_neighbors(self, point_id: int) -> np.ndarray:
+        """候補を切り出してST近傍の判定を行う"""
+        candidates = self._candidates(point_id)
         
-        for i, point in enumerate(self.points):
-            if i == point_id:
-                continue
-                
-            # 空間距離の計算
-            spatial_dist = self.haversine_distance(
-                center_point.lat, center_point.lon,
-                point.lat, point.lon
-            )
-            
-            # 時間距離の計算
-            temporal_dist = self.temporal_distance(
-                center_point.time, point.time
-            )
+        if njit is not None:
+            return _st_neighbors_kernel(self._lats, self._lons, self._times, self._cos_lats,
+                                        candidates, point_id, self.eps1, self.eps2,
+                                        self._dlat_max, self._dlon_max)
+        
+        # 時間距離と緯度差・経度差で先に候補を絞る（自分自身も除く）
+        temporal_dist = self.temporal_distance(
+            self._times[point_id], self._times[candidates]
+        )
+        in_box = ((temporal_dist <= self.eps2)
+                  & (np.abs(self._lats[candidates] - self._lats[point_id]) <= self._dlat_max)
+                  & (np.abs(self._lons[candidates] - self._lons[point_id]) <= self._dlon_max)
+                  & (candidates != point_id))
+        candidates = candidates[in_box]
+        
+        # 残った候補との空間距離を一括で求めて判定する
+        # （haversine_distance と同じ式で、cos(緯度) は fit で求めた値を使う）
+        dlon = np.radians(self._lons[candidates] - self._lons[point_id])
+        dlat = np.radians(self._lats[candidates] - self._lats[point_id])
+        a = (np.sin(dlat / 2)**2
+             + self._cos_lats[point_id] * self._cos_lats[candidates] * np.sin(dlon / 2)**2)
+        spatial_dist = EARTH_RADIUS_KM * (2 * np.arcsin(np.sqrt(a)))
+        
+        return candidates[spatial_dist <= self.eps1]
+    
+    def _precompute_neighbors(self, n_jobs: int) -> List[np.ndarray]:
+        """
+        全ポイントの近傍をスレッドで並列に求める
+        
+        DBSCANでは各ポイントの近傍はちょうど1回ずつ必要になるため、
+        計算量は都度計算する場合と変わらない。numbaのカーネルとKD木の検索は
+        GILを解放するので、スレッド数に応じて並列に動く
+        """
+        n = len(self._times)
+        chunks = np.array_split(np.arange(n), n_jobs)
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(
+                lambda ids: [self._query_neighbors(i) for i in ids.tolist()], chunks)
+        return [neighbors for chunk in results for neighbors in chunk]
+    
+    def _candidates(self, point_id: int) -> np.ndarray:
+        """
+        ST近傍になりうるポイントのIDを昇順で返す
+        
+        データが時刻・緯度・経度の格子上にある場合（Open-Meteoの格子データなど）は、
+        格子インデックスから時間・緯度・経度の範囲に入るセルだけを切り出す。
+        それ以外は時刻順に並べた配列から、時間距離がeps2以内の区間を二分探索で切り出す。
+        その区間に全体の半分以上が残る（時間方向の絞り込みが効かない）場合は、
+        KD木があれば空間方向の半径検索を使う。
+        最終的な判定は get_neighbors の距離計算で行う
+        """
+        # 境界上の点を落とさないよう、検索範囲はどちらもわずかに広げておく
+        t = self._times[point_id]
+        span = self.eps2 + 1e-9 * (abs(t) + self.eps2)
+        
+        if self._grid is not None:
+            # 格子上では時間・緯度・経度それぞれの範囲を二分探索し、その範囲のセルだけを見る
+            lat = self._lats[point_id]
+            lon = self._lons[point_id]
+            t0, t1 = (np.searchsorted(self._grid_times, t - span, side='left'),
+                      np.searchsorted(self._grid_times, t + span, side='right'))
+            r0, r1 = (np.searchsorted(self._grid_lats, lat - self._dlat_max, side='left'),
+                      np.searchsorted(self._grid_lats, lat + self._dlat_max, side='right'))
+            c0, c1 = (np.searchsorted(self._grid_lons, lon - self._dlon_max, side='left'),
+                      np.searchsorted(self._grid_lons, lon + self._dlon_max, side='right'))
+            block = self._grid[t0:t1, r0:r1, c0:c1]
+            candidates = block[block >= 0].astype(np.int64)
+        else:
+            lo = np.searchsorted(self._times_sorted, t - span, side='left')
+            hi = np.searchsorted(self._times_sorted, t + span, side='right')
             
-            # ST近傍の判定
-            if spatial_dist <= self.eps1 and temporal_dist <= self.eps2:
-                neighbors.append(i)
+            if self._tree is not None and 2 * (hi - lo) > len(self._times_sorted):
+                # 単位球面上の弦の長さは大円距離に対して単調なので、eps1を弦の長さに換算して検索する
+                angle = min(self.eps1 / EARTH_RADIUS_KM, np.pi)
+                radius = 2 * np.sin(angle / 2) * (1 + 1e-9)
+                candidates = np.array(
+                    self._tree.query_ball_point(self._unit_xyz[point_id], r=radius),
+                    dtype=np.int64)
+            else:
+                candidates = self._time_order[lo:hi].copy()
+        
+        candidates.sort()  # 近傍の順序（=クラスタ拡張の順序）を総当たりの場合と揃える
+        return candidates
+    
+    def _build_grid_index(self):
+        """
+        データが時刻・緯度・経度の格子上にあれば、セルごとのポイントIDを持つ3次元配列を作る
+        
+        格子の間隔が一定である必要はなく、時刻・緯度・経度それぞれのユニーク値を軸とする。
+        セル数が多すぎる場合や、同じセルに複数のポイントがある場合は None を返す
+        """
+        n = len(self._times)
+        if n == 0:
+            return None
+        
+        self._grid_times, t_idx = np.unique(self._times, return_inverse=True)
+        self._grid_lats, r_idx = np.unique(self._lats, return_inverse=True)
+        self._grid_lons, c_idx = np.unique(self._lons, return_inverse=True)
+        shape = (len(self._grid_times), len(self._grid_lats), len(self._grid_lons))
+        if shape[0] * shape[1] * shape[2] > _GRID_MAX_CELLS_PER_POINT * n:
+            return None
+        
+        grid = np.full(shape, -1, dtype=np.int32)
+        grid[t_idx, r_idx, c_idx] = np.arange(n, dtype=np.int32)
+        if np.count_nonzero(grid >= 0) != n:
+            return None
+        
+        return grid
+    
+    def _coordinate_bounds(self) -> Tuple[float, float]:
+        """
+        Haversine距離がeps1以内の2点がとりうる緯度差・経度差の上限（度）を返す
+        
+        緯度差は eps1/R 以下、経度差はデータ中の最も高緯度での幅以下になる。
+        高緯度で経度の幅が定まらない場合や、経度の範囲が一周に近く
+        180度線をまたぐ組が生じうる場合は、経度差の上限を inf とする
+        """
+        angle = self.eps1 / EARTH_RADIUS_KM
+        dlat_max = np.degrees(angle) * (1 + 1e-9) + 1e-9
         
-        return neighbors
+        dlon_max = np.inf
+        if len(self._lats) > 0:
+            cos_min = np.cos(np.radians(np.abs(self._lats).max()))
+            if 0 <= np.sin(angle / 2) <= 0.5 * cos_min:
+                dlon = np.degrees(2 * np.arcsin(np.sin(angle / 2) / cos_min)) * (1 + 1e-9) + 1e-9
+                if self._lons.max() - self._lons.min() + dlon < 360:
+                    dlon_max = dlon
+        
+        return float(dlat_max), float(dlon_max)
     
     def expand_cluster(self, point_id: int, neighbors: List[int]) -> bool:
         """
@@ -140,7 +321,7 @@ class STDBSCAN:
         ----------
         point_id : int
             開始ポイントのID
-        neighbors : List[int]
+        neighbors : List[int] or np.ndarray
             近傍ポイントのIDリスト
             
         Returns
@@ -148,32 +329,41 @@ class STDBSCAN:
         bool
             クラスタの拡張に成功したかどうか
         """
+        clusters = self._clusters
+        queued = self._queued
         self.cluster_id += 1
-        self.points[point_id].cluster = self.cluster_id
+        clusters[point_id] = self.cluster_id
         
-        # 幅優先探索でクラスタを拡張
-        queue = deque(neighbors)
+        # 幅優先探索でクラスタを拡張（一度キューに入れたポイントは再び入れない）
+        # キューは先頭・末尾の位置を進めるだけの配列で持つ（各ポイント高々1回なので長さnで足りる）
+        neighbors = np.asarray(neighbors, dtype=np.int64)
+        queued[neighbors] = True
+        queue = self._queue
+        head, tail = 0, len(neighbors)
+        queue[:tail] = neighbors
         
-        while queue:
-            current_id = queue.popleft()
-            current_point = self.points[current_id]
+        while head < tail:
+            current_id = queue[head]
+            head += 1
             
             # ノイズポイントをクラスタに追加
-            if current_point.cluster == 0:
-                current_point.cluster = self.cluster_id
+            if clusters[current_id] == 0:
+                clusters[current_id] = self.cluster_id
             
             # 未分類のポイントの場合
-            if current_point.cluster == -1:
-                current_point.cluster = self.cluster_id
+            if clusters[current_id] == -1:
+                clusters[current_id] = self.cluster_id
                 
                 # 現在のポイントの近傍を取得
-                current_neighbors = self.get_neighbors(current_id)
+                current_neighbors = self._neighbors(current_id)
                 
-                # コアポイントの場合、その近傍もキューに追加
+                # コアポイントの場合、未分類でまだキューに入っていない近傍をまとめて追加
                 if len(current_neighbors) >= self.min_pts:
-                    for neighbor_id in current_neighbors:
-                        if self.points[neighbor_id].cluster == -1:
-                            queue.append(neighbor_id)
+                    new_ids = current_neighbors[(clusters[current_neighbors] == -1)
+                                                & ~queued[current_neighbors]]
+                    queued[new_ids] = True
+                    queue[tail:tail + len(new_ids)] = new_ids
+                    tail += len(new_ids)
         
         return True
     
@@ -194,26 +384,69 @@ class STDBSCAN:
         self.points = data
         self.cluster_id = 0
         
-        # 全てのポイントを未分類(-1)に初期化
-        for point in self.points:
-            point.cluster = -1
+        # 近傍探索用に緯度・経度・時刻を配列へまとめておく
+        n = len(data)
+        self._lats = np.fromiter((p.lat for p in data), dtype=np.float64, count=n)
+        self._lons = np.fromiter((p.lon for p in data), dtype=np.float64, count=n)
+        self._times = np.fromiter((p.time for p in data), dtype=np.float64, count=n)
+        
+        # 時間方向の候補を二分探索で切り出すため、時刻順の並びを持っておく
+        self._time_order = np.argsort(self._times, kind='stable')
+        self._times_sorted = self._times[self._time_order]
+        
+        # 距離計算のたびに求め直さないよう、各ポイントの cos(緯度) を一度だけ計算しておく
+        lat_rad = np.radians(self._lats)
+        self._cos_lats = np.cos(lat_rad)
+        
+        # 空間方向の候補を絞るKD木（緯度・経度を単位球面上の3次元座標に直し、
+        # ユークリッド距離＝弦の長さで検索する。近似ではなく大円距離と同じ点が得られる）
+        self._tree = None
+        if cKDTree is not None and n > 0:
+            lon_rad = np.radians(self._lons)
+            cos_lat = self._cos_lats
+            self._unit_xyz = np.column_stack([cos_lat * np.cos(lon_rad),
+                                              cos_lat * np.sin(lon_rad),
+                                              np.sin(lat_rad)])
+            self._tree = cKDTree(self._unit_xyz)
+        
+        # Haversine距離を計算する前の絞り込みに使う、緯度差・経度差の上限
+        self._dlat_max, self._dlon_max = self._coordinate_bounds()
+        
+        # 格子データ（Open-Meteoなど）なら、時刻・緯度・経度の格子から候補を切り出す
+        self._grid = self._build_grid_index()
+        
+        # 並列化する場合は全ポイントの近傍を先にまとめて求めておく
+        self._neighbor_table = None
+        n_jobs = (os.cpu_count() or 1) if self.n_jobs == -1 else self.n_jobs
+        if n_jobs > 1 and n > 0:
+            self._neighbor_table = self._precompute_neighbors(n_jobs)
+        
+        # 全てのポイントを未分類(-1)に初期化（クラスタIDは配列で管理する）
+        self._clusters = np.full(n, -1, dtype=np.int32)
+        self._queued = np.zeros(n, dtype=bool)  # クラスタ拡張のキューに入れたかどうか
+        self._queue = np.empty(n, dtype=np.int64)  # クラスタ拡張のキュー
+        clusters = self._clusters
         
         # 各ポイントについてクラスタリング
-        for i, point in enumerate(self.points):
+        for i in range(n):
             # 既に分類済みの場合はスキップ
-            if point.cluster != -1:
+            if clusters[i] != -1:
                 continue
             
             # 近傍ポイントを取得
-            neighbors = self.get_neighbors(i)
+            neighbors = self._neighbors(i)
             
             # コアポイントでない場合はノイズとしてマーク
             if len(neighbors) < self.min_pts:
-                point.cluster = 0  # ノイズ
+                clusters[i] = 0  # ノイズ
             else:
                 # クラスタを拡張
                 self.expand_cluster(i, neighbors)
         
+        # 確定したクラスタIDを各ポイントに書き戻す
+        for point, cluster_id in zip(self.points, clusters.tolist()):
+            point.cluster = cluster_id
+        
         return self
     
     def get_clusters(self) -> dict:
@@ -225,12 +458,16 @@ class STDBSCAN:
         dict
             {cluster_id: [point_indices]} の辞書
         """
+        # クラスタIDで安定ソートし、IDごとの連続区間に分ける
+        labels = self._clusters
+        order = np.argsort(labels, kind='stable')
+        cluster_ids, starts = np.unique(labels[order], return_index=True)
+        groups = np.split(order, starts[1:])
+        
+        # 辞書の並びは従来どおり、各クラスタIDが最初に現れた順にする
         clusters = {}
-        for i, point in enumerate(self.points):
-            cluster_id = point.cluster
-            if cluster_id not in clusters:
-                clusters[cluster_id] = []
-            clusters[cluster_id].append(i)
+        for k in np.argsort(order[starts], kind='stable').tolist():
+            clusters[int(cluster_ids[k])] = groups[k].tolist()
         
         return clusters
     
@@ -243,12 +480,19 @@ class STDBSCAN:
         dict
             統計情報の辞書
         """
-        clusters = self.get_clusters()
-        n_clusters = len([cid for cid in clusters.keys() if cid > 0])
-        n_noise = len(clusters.get(0, []))
+        # クラスタIDごとの点数を一度に数える（添字0はノイズ）
+        labels = self._clusters
         n_points = len(self.points)
+        counts = np.bincount(labels, minlength=1)
+        n_noise = int(counts[0])
         
-        cluster_sizes = [len(points) for cid, points in clusters.items() if cid > 0]
+        # クラスタサイズの並びは従来どおり、各クラスタIDが最初に現れた順にする
+        first = np.full(counts.size, labels.size, dtype=np.int64)
+        np.minimum.at(first, labels, np.arange(labels.size))
+        cluster_ids = np.flatnonzero(counts[1:]) + 1
+        cluster_ids = cluster_ids[np.argsort(first[cluster_ids], kind='stable')]
+        cluster_sizes = counts[cluster_ids].tolist()
+        n_clusters = len(cluster_sizes)
         
         stats = {
             'n_points': n_points,
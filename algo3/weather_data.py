@@ -18,16 +18,24 @@ Open-Meteo API を使用した気象データ取得モジュール
 """
 
 import json
+import sys
 from typing import Dict, List, Optional
 from datetime import datetime
 from pathlib import Path
 from dataclasses import dataclass
+import numpy as np
 import requests
 
 from st_dbscan import STPoint
 
+try:
+    import orjson
+except ImportError:  # orjson は任意（未導入なら標準の json で読み書きする）
+    orjson = None
 
-@dataclass
+
+# STPointと同じく、Python 3.10 以降では __slots__ 付きにする（付けないとサブクラスで __dict__ が復活する）
+@dataclass(**({'slots': True} if sys.version_info >= (3, 10) else {}))
 class WeatherPoint(STPoint):
     """
     天気データ用の時空間データポイント
@@ -57,9 +65,12 @@ class WeatherData:
             self.grid_data = api_response
         self.metadata = metadata or {}
 
-    def to_stpoints(self, precipitation_threshold: float = 0.1) -> List[WeatherPoint]:
+    def to_arrays(self, precipitation_threshold: float = 0.1) -> Dict[str, np.ndarray]:
         """
-        WeatherPointのリストに変換
+        降水ポイントを列ごとのNumPy配列に変換
+
+        WeatherPointを生成せずに、緯度・経度・時刻・降水量をそのまま配列で返す。
+        並び順は to_stpoints と同じ（グリッドポイント順、各グリッド内は時刻順）
 
         Parameters
         ----------
@@ -68,11 +79,12 @@ class WeatherData:
 
         Returns
         -------
-        List[WeatherPoint]
-            WeatherPointのリスト
+        Dict[str, np.ndarray]
+            'lat', 'lon', 'time'（Unixタイムスタンプ）, 'value' をキーとする float64 配列
         """
-        weather_points = []
-        point_id = 0
+        columns = {key: [] for key in ('lat', 'lon', 'time', 'value')}
+        # 時刻列はどのグリッドポイントでも通常同じなので、変換結果を使い回す
+        parsed_times = {}
 
         # 各グリッドポイントを処理
         for grid_point in self.grid_data:
@@ -85,25 +97,53 @@ class WeatherData:
             if not time_strings or not precipitation_values:
                 continue
 
-            # 各時刻について処理
-            for time_idx, (time_str, precip) in enumerate(zip(time_strings, precipitation_values)):
-                # 降水がある場合のみWeatherPointを生成
-                if precip is not None and precip >= precipitation_threshold:
-                    # 時刻文字列をUnixタイムスタンプに変換
-                    dt = datetime.fromisoformat(time_str)
-                    unix_time = dt.timestamp()
-
-                    point = WeatherPoint(
-                        id=point_id,
-                        lat=lat,
-                        lon=lon,
-                        time=unix_time,
-                        value=float(precip)
-                    )
-                    weather_points.append(point)
-                    point_id += 1
-
-        return weather_points
+            # 欠損値(None)はNaNになり、閾値との比較は常に偽になる
+            n_times = min(len(time_strings), len(precipitation_values))
+            precip = np.array(precipitation_values[:n_times], dtype=np.float64)
+            indices = np.flatnonzero(precip >= precipitation_threshold)
+            if len(indices) == 0:
+                continue
+
+            # 時刻文字列をUnixタイムスタンプに変換（同じ時刻列は一度だけ変換する）
+            # datetime64 はUTCとして解釈するため使わず、従来どおりローカル時刻として変換する
+            time_key = tuple(time_strings[:n_times])
+            unix_times = parsed_times.get(time_key)
+            if unix_times is None:
+                unix_times = np.array(
+                    [datetime.fromisoformat(time_str).timestamp() for time_str in time_key],
+                    dtype=np.float64)
+                parsed_times[time_key] = unix_times
+
+            columns['lat'].append(np.full(len(indices), lat, dtype=np.float64))
+            columns['lon'].append(np.full(len(indices), lon, dtype=np.float64))
+            columns['time'].append(unix_times[indices])
+            columns['value'].append(precip[indices])
+
+        return {key: np.concatenate(parts) if parts else np.empty(0, dtype=np.float64)
+                for key, parts in columns.items()}
+
+    def to_stpoints(self, precipitation_threshold: float = 0.1) -> List[WeatherPoint]:
+        """
+        WeatherPointのリストに変換
+
+        Parameters
+        ----------
+        precipitation_threshold : float
+            降水とみなす閾値 (mm/h、デフォルト: 0.1mm/h)
+
+        Returns
+        -------
+        List[WeatherPoint]
+            WeatherPointのリスト
+        """
+        arrays = self.to_arrays(precipitation_threshold)
+
+        return [
+            WeatherPoint(id=point_id, lat=lat, lon=lon, time=unix_time, value=value)
+            for point_id, (lat, lon, unix_time, value) in enumerate(zip(
+                *(arrays[key].tolist() for key in ('lat', 'lon', 'time', 'value'))
+            ))
+        ]
 
     @classmethod
     def from_json(cls, filepath: str) -> 'WeatherData':
@@ -120,8 +160,12 @@ class WeatherData:
         WeatherData
             WeatherDataインスタンス
         """
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        if orjson is not None:
+            with open(filepath, 'rb') as f:
+                data = orjson.loads(f.read())
+        else:
+            with open(filepath, 'r', encoding='utf-8') as f:
+                data = json.load(f)
 
         # メタデータを分離
         metadata = data.get('_metadata', {})
@@ -129,7 +173,7 @@ class WeatherData:
 
         return cls(api_response=grid_data, metadata=metadata)
 
-    def save_json(self, filepath: str) -> None:
+    def save_json(self, filepath: str, pretty: bool = False) -> None:
         """
         気象データをJSONファイルに保存
 
@@ -137,6 +181,8 @@ class WeatherData:
         ----------
         filepath : str
             保存先のJSONファイルパス
+        pretty : bool
+            Trueならインデント付きで整形する（デフォルトは空白なしのコンパクト形式）
         """
         # データとメタデータを結合
         save_data = {
@@ -144,8 +190,16 @@ class WeatherData:
             '_metadata': self.metadata
         }
 
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(save_data, f, ensure_ascii=False, indent=2)
+        if orjson is not None:
+            option = orjson.OPT_INDENT_2 if pretty else 0
+            with open(filepath, 'wb') as f:
+                f.write(orjson.dumps(save_data, option=option))
+        else:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                if pretty:
+                    json.dump(save_data, f, ensure_ascii=False, indent=2)
+                else:
+                    json.dump(save_data, f, ensure_ascii=False, separators=(',', ':'))
 
 
 class WeatherDataFetcher:
@@ -165,6 +219,9 @@ class WeatherDataFetcher:
                  api_base_url: str = 'https://api.open-meteo.com/v1/forecast'):
         self.cache_dir = Path(cache_dir)
         self.api_base_url = api_base_url
+        # 同じインスタンスからの複数回の取得でHTTP接続を使い回す
+        # （gzip/deflate の圧縮転送は requests が既定で要求・展開する）
+        self.session = requests.Session()
 
         # キャッシュディレクトリを作成
         self.cache_dir.mkdir(parents=True, exist_ok=True)
@@ -279,7 +336,7 @@ class WeatherDataFetcher:
         }
 
         try:
-            response = requests.get(self.api_base_url, params=params, timeout=30)
+            response = self.session.get(self.api_base_url, params=params, timeout=30)
             response.raise_for_status()
             api_data = response.json()
 